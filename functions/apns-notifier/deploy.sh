@@ -28,8 +28,19 @@ gcloud functions deploy trigger-apns-notification \
   --allow-unauthenticated \
   --memory=256MB \
   --timeout=60s \
+  --set-secrets="APNS_AUTH_KEY=apns-auth-key:latest,APNS_KEY_ID=apns-key-id:latest,APNS_TEAM_ID=apns-team-id:latest" \
   --project=$PROJECT
 
+# Let Firestore delete deactivated tokens once their expire_at passes
+echo "Enabling TTL on apns_tokens.expire_at..."
+gcloud firestore fields ttls update expire_at \
+  --collection-group=apns_tokens \
+  --enable-ttl \
+  --project=$PROJECT
+
+# Token documents written under raw-token IDs by older versions are moved to
+# hashed IDs once with: python migrate_token_ids.py
+
 echo "Done! Functions deployed."
 echo ""
 echo "Endpoints:"
@@ -7,7 +7,6 @@ Handles:
 """
 import functions_framework
 from flask import Request
-from datetime import datetime, timezone
 import hmac
 import os
 import sys
@@ -16,14 +15,24 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from shared.logging_config import CloudFunctionLogger
-from shared.http_utils import handle_cors_preflight, json_response, error_response
+from shared.http_utils import (
+    handle_cors_preflight, json_response, error_response, get_json_body,
+)
 from shared.validation import TokenValidator
-from shared.firestore_utils import get_db
-from shared.apns_utils import send_apns_notifications, APNS_TOKENS_COLLECTION
+from shared.firestore_utils import get_db, TOKEN_EXPIRY_FIELD
+from shared.apns_utils import (
+    apns_token_doc_id, send_apns_notifications, start_warm_up,
+    APNS_TOKENS_COLLECTION,
+)
 
 # Initialize logger
 logger = CloudFunctionLogger("apns-notifier")
 
+# Open APNs connections while the instance starts; FUNCTION_TARGET is only
+# set by the Cloud Functions runtime, so this is skipped locally and in tests.
+if os.environ.get("FUNCTION_TARGET") == "trigger_apns_notification":
+    start_warm_up()
+
 
 @functions_framework.http
 def register_apns_token(request: Request):
@@ -45,7 +54,7 @@ def register_apns_token(request: Request):
         return error_response("Method not allowed", 405)
 
     try:
-        data = request.get_json(silent=True)
+        data = get_json_body(request)
         if not data:
             return error_response("Invalid JSON body")
 
@@ -57,19 +66,23 @@ def register_apns_token(request: Request):
         if not TokenValidator.is_valid_apns_token(token):
             return error_response("Invalid APNs token format")
 
-        # Store in Firestore
+        # Store in Firestore under the hashed document ID. Documents left
+        # under the raw-token ID by earlier versions are moved once by
+        # migrate_token_ids.py rather than on every registration.
         db = get_db()
-        doc_ref = db.collection(APNS_TOKENS_COLLECTION).document(token)
+        from google.cloud.firestore import SERVER_TIMESTAMP
+        doc_ref = db.collection(APNS_TOKENS_COLLECTION).document(
+            apns_token_doc_id(token))
 
-        now = datetime.now(timezone.utc)
         doc_ref.set({
             "token": token,
             "platform": "ios",
             "app_version": app_version if app_version else None,
             "sandbox": sandbox,
-            "registered_at": now,
-            "last_seen": now,
+            "registered_at": SERVER_TIMESTAMP,
+            "last_seen": SERVER_TIMESTAMP,
             "active": True,
+            TOKEN_EXPIRY_FIELD: None,
         }, merge=True)
 
         logger.info("APNs token registered", sandbox=sandbox, app_version=app_version)
@@ -114,7 +127,7 @@ def trigger_apns_notification(request: Request):
         return error_response("Unauthorized", 403)
 
     try:
-        data = request.get_json(silent=True) or {}
+        data = get_json_body(request) or {}
         title = data.get("title", "Test Notification")[:64]
         body = data.get("body", "This is a test notification")[:256]
         article_url = data.get("article_url", "https://example.com")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+One-time migration of APNs token documents to hashed document IDs.
+
+Earlier versions of register_apns_token stored each device under its raw
+64-char token as the document ID. Tokens are now keyed by apns_token_doc_id,
+so this copies every legacy document to its hashed ID and deletes the
+original. Safe to re-run: documents already under a hashed ID are skipped.
+
+Usage (from this directory, with application default credentials):
+    python migrate_token_ids.py [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+# Add shared module to path, as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.apns_utils import apns_token_doc_id, APNS_TOKENS_COLLECTION
+from shared.firestore_utils import get_db, MAX_BATCH_WRITES
+
+
+def migrate_legacy_tokens(db, dry_run: bool = False) -> int:
+    """Move raw-token documents to their hashed IDs.
+
+    Returns:
+        Number of legacy documents migrated (or found, with dry_run)
+    """
+    tokens = db.collection(APNS_TOKENS_COLLECTION)
+    batch = db.batch()
+    pending = 0
+    migrated = 0
+
+    for doc in tokens.stream():
+        data = doc.to_dict()
+        token = data.get("token")
+        if not token or doc.id != token:
+            continue
+
+        migrated += 1
+        if dry_run:
+            continue
+
+        # Each migration is two writes; merge keeps any newer fields already
+        # written under the hashed ID by a re-registration.
+        batch.set(tokens.document(apns_token_doc_id(token)), data, merge=True)
+        batch.delete(doc.reference)
+        pending += 2
+        if pending >= MAX_BATCH_WRITES:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Count legacy documents without changing them')
+    args = parser.parse_args()
+
+    count = migrate_legacy_tokens(get_db(), dry_run=args.dry_run)
+    action = "Found" if args.dry_run else "Migrated"
+    print(f"{action} {count} legacy APNs token document(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -84,3 +84,49 @@ class TestRegisterApnsToken:
             assert status == 200
             assert data["success"] is True
             mock_db.collection.assert_called_once()
+
+            from shared.apns_utils import apns_token_doc_id
+            tokens = mock_db.collection.return_value
+            tokens.document.assert_called_once_with(
+                apns_token_doc_id(valid_token))
+            doc_ref = tokens.document.return_value
+            assert doc_ref.set.call_args[0][0]["token"] == valid_token
+            doc_ref.delete.assert_not_called()
+            mock_db.batch.assert_not_called()
+
+
+class TestMigrateTokenIds:
+    """Tests for the one-time raw-token ID migration."""
+
+    def _doc(self, doc_id, token):
+        doc = MagicMock()
+        doc.id = doc_id
+        doc.to_dict.return_value = {"token": token, "active": True}
+        return doc
+
+    def test_moves_only_legacy_documents(self):
+        from migrate_token_ids import migrate_legacy_tokens
+        from shared.apns_utils import apns_token_doc_id
+        legacy = self._doc("a" * 64, "a" * 64)
+        current = self._doc(apns_token_doc_id("b" * 64), "b" * 64)
+        db = MagicMock()
+        tokens = db.collection.return_value
+        tokens.stream.return_value = [legacy, current]
+
+        assert migrate_legacy_tokens(db) == 1
+
+        batch = db.batch.return_value
+        tokens.document.assert_called_once_with(apns_token_doc_id("a" * 64))
+        batch.set.assert_called_once_with(
+            tokens.document.return_value, legacy.to_dict(), merge=True)
+        batch.delete.assert_called_once_with(legacy.reference)
+        batch.commit.assert_called_once()
+
+    def test_dry_run_writes_nothing(self):
+        from migrate_token_ids import migrate_legacy_tokens
+        db = MagicMock()
+        db.collection.return_value.stream.return_value = [
+            self._doc("a" * 64, "a" * 64)]
+
+        assert migrate_legacy_tokens(db, dry_run=True) == 1
+        db.batch.return_value.commit.assert_not_called()
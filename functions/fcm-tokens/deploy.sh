@@ -34,6 +34,13 @@ gcloud functions deploy unregister-token \
     --memory=256MB \
     --timeout=30s
 
+# Let Firestore delete soft-deleted tokens once their expire_at passes
+echo "Enabling TTL on fcm_tokens.expire_at..."
+gcloud firestore fields ttls update expire_at \
+    --collection-group=fcm_tokens \
+    --enable-ttl \
+    --project="$PROJECT_ID"
+
 echo "Deployment complete!"
 echo ""
 echo "Endpoints:"
@@ -6,7 +6,6 @@ Tokens are stored in Firestore for push notification targeting.
 """
 import functions_framework
 from flask import Request
-from datetime import datetime, timezone
 import os
 import sys
 
@@ -14,16 +13,17 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from shared.logging_config import CloudFunctionLogger
-from shared.http_utils import handle_cors_preflight, json_response, error_response
+from shared.http_utils import (
+    handle_cors_preflight, json_response, error_response, get_json_body,
+)
 from shared.validation import TokenValidator
-from shared.firestore_utils import get_db
+from shared.firestore_utils import (
+    get_db, inactive_token_expiry, FCM_TOKENS_COLLECTION, TOKEN_EXPIRY_FIELD,
+)
 
 # Initialize logger
 logger = CloudFunctionLogger("fcm-tokens")
 
-# Firestore collection for FCM tokens
-FCM_TOKENS_COLLECTION = "fcm_tokens"
-
 
 @functions_framework.http
 def register_token(request: Request):
@@ -50,7 +50,7 @@ def register_token(request: Request):
         return error_response("Method not allowed", 405)
 
     try:
-        data = request.get_json(silent=True)
+        data = get_json_body(request)
         if not data:
             return error_response("Invalid JSON body")
 
@@ -68,16 +68,17 @@ def register_token(request: Request):
 
         # Store in Firestore
         db = get_db()
+        from google.cloud.firestore import SERVER_TIMESTAMP
         doc_ref = db.collection(FCM_TOKENS_COLLECTION).document(token)
 
-        now = datetime.now(timezone.utc)
         doc_ref.set({
             "token": token,
             "platform": platform,
             "app_version": app_version if app_version else None,
-            "registered_at": now,
-            "last_seen": now,
+            "registered_at": SERVER_TIMESTAMP,
+            "last_seen": SERVER_TIMESTAMP,
             "active": True,
+            TOKEN_EXPIRY_FIELD: None,
         }, merge=True)
 
         logger.info("FCM token registered", platform=platform, app_version=app_version)
@@ -112,7 +113,7 @@ def unregister_token(request: Request):
         return error_response("Method not allowed", 405)
 
     try:
-        data = request.get_json(silent=True)
+        data = get_json_body(request)
         if not data:
             return error_response("Invalid JSON body")
 
@@ -121,13 +122,16 @@ def unregister_token(request: Request):
         if not TokenValidator.is_valid_fcm_token(token):
             return error_response("Invalid FCM token format")
 
-        # Mark as inactive in Firestore (soft delete)
+        # Mark as inactive in Firestore (soft delete); the TTL policy on
+        # TOKEN_EXPIRY_FIELD removes the document later without another write.
         # Use set with merge=True to avoid exception if document doesn't exist
         db = get_db()
+        from google.cloud.firestore import SERVER_TIMESTAMP
         doc_ref = db.collection(FCM_TOKENS_COLLECTION).document(token)
         doc_ref.set({
             "active": False,
-            "unregistered_at": datetime.now(timezone.utc),
+            "unregistered_at": SERVER_TIMESTAMP,
+            TOKEN_EXPIRY_FIELD: inactive_token_expiry(),
         }, merge=True)
 
         logger.info("FCM token unregistered")
@@ -2,6 +2,7 @@
 import json
 import sys
 import os
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
 # Mock functions_framework before importing main (not available in Py3.13)
@@ -11,6 +12,7 @@ sys.modules.setdefault("functions_framework", _mock_ff)
 
 import flask
 import pytest
+from google.cloud.firestore import SERVER_TIMESTAMP
 
 # Add shared module to path
 sys.path.insert(
@@ -101,6 +103,11 @@ class TestRegisterToken:
             assert data["success"] is True
             mock_db.collection.assert_called_once()
 
+            doc_ref = mock_db.collection.return_value.document.return_value
+            fields = doc_ref.set.call_args[0][0]
+            assert fields["registered_at"] is SERVER_TIMESTAMP
+            assert fields["last_seen"] is SERVER_TIMESTAMP
+
 
 class TestUnregisterToken:
     """Tests for unregister_token handler."""
@@ -151,3 +158,9 @@ class TestUnregisterToken:
             data = json.loads(response.get_data(as_text=True))
             assert status == 200
             assert data["success"] is True
+
+            doc_ref = mock_db.collection.return_value.document.return_value
+            fields = doc_ref.set.call_args[0][0]
+            assert fields["active"] is False
+            assert fields["unregistered_at"] is SERVER_TIMESTAMP
+            assert fields["expire_at"] > datetime.now(timezone.utc)
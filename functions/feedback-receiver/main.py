@@ -19,6 +19,23 @@ if not firebase_admin._apps:
 
 BUCKET_NAME = os.environ.get("FEEDBACK_BUCKET_NAME", "tsvet01-agent-brain")
 
+_storage_client = None
+
+
+def get_storage_client() -> storage.Client:
+    """Lazy-load and cache the Cloud Storage client across warm invocations."""
+    global _storage_client
+
+    if _storage_client is None:
+        _storage_client = storage.Client()
+    return _storage_client
+
+
+def reset_storage_client():
+    """Clear the cached Cloud Storage client (for testing)."""
+    global _storage_client
+    _storage_client = None
+
 
 def _verify_token(request):
     """Extract and verify Firebase ID token from Authorization header."""
@@ -127,8 +144,7 @@ def receive_feedback(request):
     date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
     # Load, upsert, save
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
+    bucket = get_storage_client().bucket(BUCKET_NAME)
 
     entries = _load_feedback(bucket, date_str)
     entries = _upsert_feedback(entries, uid, summary_url, feedback, prompt_version,
@@ -20,6 +20,8 @@ def mock_firebase():
 
 @pytest.fixture
 def mock_gcs():
+    import main
+    main.reset_storage_client()
     with patch("main.storage") as mock_storage:
         mock_bucket = MagicMock()
         mock_blob = MagicMock()
@@ -27,6 +29,7 @@ def mock_gcs():
         mock_bucket.blob.return_value = mock_blob
         mock_storage.Client.return_value.bucket.return_value = mock_bucket
         yield mock_storage, mock_bucket, mock_blob
+    main.reset_storage_client()
 
 
 @pytest.fixture
@@ -217,3 +220,13 @@ def test_clears_aspect_feedback(app, mock_firebase, mock_gcs):
     assert len(uploaded) == 1
     assert "selection_feedback" not in uploaded[0]     # cleared
     assert uploaded[0]["summary_feedback"] == "down"    # preserved
+
+
+def test_reuses_storage_client(app, mock_firebase, mock_gcs):
+    mock_storage, _, _ = mock_gcs
+    body = {"summary_url": "https://example.com/a", "feedback": "up"}
+
+    app(make_request(json_body=body))
+    app(make_request(json_body=body))
+
+    mock_storage.Client.assert_called_once()
@@ -42,7 +42,16 @@ gcloud functions deploy $FUNCTION_NAME \
   --trigger-location=$REGION \
   --trigger-event-filters="type=google.cloud.storage.object.v1.finalized" \
   --trigger-event-filters="bucket=$BUCKET_NAME" \
+  --retry \
   --set-env-vars "GMAIL_USER=$GMAIL_USER,DEST_EMAIL=$DEST_EMAIL,GMAIL_APP_PASSWORD=$GMAIL_APP_PASSWORD" \
+  --set-secrets "APNS_AUTH_KEY=apns-auth-key:latest,APNS_KEY_ID=apns-key-id:latest,APNS_TEAM_ID=apns-team-id:latest" \
+  --project $PROJECT_ID
+
+# Let Firestore delete processed-event records once their expire_at passes
+echo "Enabling TTL on notifier_events.expire_at..."
+gcloud firestore fields ttls update expire_at \
+  --collection-group=notifier_events \
+  --enable-ttl \
   --project $PROJECT_ID
 
 echo "✅ Function Deployed!"
@@ -7,27 +7,39 @@ Handles:
 3. FCM push notifications to mobile apps
 4. APNs push notifications to iOS Swift app
 """
+import atexit
 import functions_framework
+import hashlib
+import io
 import json
 import os
 import re
 import smtplib
-import requests
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.policy import SMTP as SMTP_POLICY
+from google.api_core.exceptions import AlreadyExists
 from google.cloud import storage
 from google.auth.transport.requests import Request
 import google.auth
-import markdown
-import bleach
+import httpx
+import nh3
+import orjson
+from markdown_it import MarkdownIt
 import sys
 
 # Add shared module to path for Cloud Functions deployment
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from shared.logging_config import CloudFunctionLogger
-from shared.firestore_utils import get_db
-from shared.apns_utils import send_apns_notifications
+from shared.firestore_utils import (
+    get_db, active_tokens, batch_update, inactive_token_expiry,
+    FCM_TOKENS_COLLECTION, TOKEN_EXPIRY_FIELD,
+)
+from shared.apns_utils import send_apns_notifications, start_warm_up
 
 # Initialize logger
 logger = CloudFunctionLogger("notifier")
@@ -35,15 +47,101 @@ logger = CloudFunctionLogger("notifier")
 # FCM HTTP v1 API endpoint
 FCM_API_URL = "https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
 PROJECT_ID = os.environ.get('GOOGLE_CLOUD_PROJECT', 'tsvet01')
+FCM_SEND_URL = FCM_API_URL.format(project_id=PROJECT_ID)
+
+# One document per processed summary object generation, so redelivered GCS
+# events are recognised on any instance. Firestore TTL removes them.
+PROCESSED_EVENTS_COLLECTION = "notifier_events"
+PROCESSED_EVENT_TTL = timedelta(days=7)
+
+# FCM error codes meaning the token will never be deliverable again; tokens
+# failing with these are deactivated. Unregistered tokens come back as
+# NOT_FOUND with an UNREGISTERED FcmError detail, which fcm_error_reason
+# prefers. A bare NOT_FOUND (e.g. a wrong project ID) says nothing about the
+# token, so it is deliberately not listed.
+FCM_INVALID_TOKEN_ERRORS = frozenset({
+    "UNREGISTERED",
+    "INVALID_ARGUMENT",
+})
+
+# Upper bound on in-flight FCM requests during a fan-out
+FCM_MAX_CONCURRENT_SENDS = 32
+
+_fcm_client = None
+_fcm_client_lock = threading.Lock()
+
+_smtp = None
+_smtp_lock = threading.Lock()
+
+_storage_client = None
+
+_fcm_credentials = None
+_auth_request = None
+_fcm_credentials_lock = threading.Lock()
 
 
 def get_access_token():
-    """Get OAuth2 access token for FCM API using application default credentials."""
-    credentials, project = google.auth.default(
-        scopes=['https://www.googleapis.com/auth/firebase.messaging']
-    )
-    credentials.refresh(Request())
-    return credentials.token
+    """Get OAuth2 access token for FCM API using application default credentials.
+
+    The credentials are cached across warm invocations and only refreshed
+    once google-auth reports them invalid (expired or about to expire).
+    """
+    global _fcm_credentials, _auth_request
+
+    with _fcm_credentials_lock:
+        if _fcm_credentials is None:
+            _fcm_credentials, _ = google.auth.default(
+                scopes=['https://www.googleapis.com/auth/firebase.messaging']
+            )
+            _auth_request = Request()
+        if not _fcm_credentials.valid:
+            _fcm_credentials.refresh(_auth_request)
+        return _fcm_credentials.token
+
+
+def reset_access_token():
+    """Clear the cached FCM credentials (for testing)."""
+    global _fcm_credentials, _auth_request
+    with _fcm_credentials_lock:
+        _fcm_credentials = None
+        _auth_request = None
+
+
+def get_storage_client() -> storage.Client:
+    """Lazy-load and cache the Cloud Storage client across warm invocations."""
+    global _storage_client
+
+    if _storage_client is None:
+        _storage_client = storage.Client()
+    return _storage_client
+
+
+def reset_storage_client():
+    """Clear the cached Cloud Storage client (for testing)."""
+    global _storage_client
+    _storage_client = None
+
+
+def warm_up_storage():
+    """Create the Storage client so the first event skips its setup.
+
+    The SMTP session is deliberately left lazy: the trigger fires for every
+    object in the bucket and most events are skipped, so logging in to Gmail
+    on each cold start would mostly be wasted and count against its login
+    rate limits.
+    """
+    try:
+        get_storage_client()
+    except Exception as e:
+        logger.warning("Storage warm-up failed", error=str(e))
+
+
+def warm_up_fcm():
+    """Fetch the FCM access token so the first event skips the exchange."""
+    try:
+        get_access_token()
+    except Exception as e:
+        logger.warning("FCM warm-up failed", error=str(e))
 
 
 # Allowed HTML tags for email content sanitization
@@ -51,32 +149,111 @@ ALLOWED_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li',
                 'strong', 'em', 'a', 'br', 'hr', 'code', 'pre', 'blockquote']
 ALLOWED_ATTRS = {'a': ['href']}
 
+# Build the sanitizer (and the markdown parser) once per instance rather than
+# re-deriving the allow-lists on every clean
+_cleaner = nh3.Cleaner(
+    tags=set(ALLOWED_TAGS),
+    attributes={tag: set(attrs) for tag, attrs in ALLOWED_ATTRS.items()},
+)
+_markdown = MarkdownIt("commonmark")
+# Every link still renders as <a> (so an unsafe URL never shows up as raw
+# text), but its href is blanked unless the scheme is one nh3 keeps; nh3's
+# own scheme filter is then a second layer rather than the only one.
+_markdown.validateLink = lambda url: True
+_normalize_markdown_link = _markdown.normalizeLink
+_URL_SCHEME = re.compile(r'([a-zA-Z][a-zA-Z0-9+.\-]*):')
+
+
+def _normalize_link(url: str) -> str:
+    """Normalize a markdown link URL, dropping schemes nh3 would not allow."""
+    url = _normalize_markdown_link(url)
+    scheme = _URL_SCHEME.match(url)
+    if scheme and scheme.group(1).lower() not in nh3.ALLOWED_URL_SCHEMES:
+        return ""
+    return url
+
+
+_markdown.normalizeLink = _normalize_link
+
+
+def _clean_html(html: str) -> str:
+    """Strip everything but ALLOWED_TAGS/ALLOWED_ATTRS from an HTML fragment."""
+    return _cleaner.clean(html)
+
+
+# (pattern, replacement) pairs applied in order by _strip_markdown
+_MARKDOWN_SUBS = tuple((re.compile(pattern, flags), repl) for pattern, repl, flags in (
+    (r'```.*?```', '', re.DOTALL),  # code blocks (before inline code)
+    (r'^#{1,6}\s+', '', re.MULTILINE),  # headings
+    (r'\*\*(.+?)\*\*', r'\1', 0),  # bold
+    (r'\*(.+?)\*', r'\1', 0),  # italic
+    (r'`(.+?)`', r'\1', 0),  # inline code
+    (r'^\s*[-*+]\s+', '', re.MULTILINE),  # list bullets
+    (r'^\s*\d+\.\s+', '', re.MULTILINE),  # numbered lists
+    (r'!\[([^\]]*)\]\([^)]+\)', '', 0),  # images (before links)
+    (r'\[([^\]]+)\]\([^)]+\)', r'\1', 0),  # links
+    (r'^\s*>\s+', '', re.MULTILINE),  # blockquotes
+    (r'\n{2,}', '\n', 0),  # collapse blank lines
+))
+
 
 def _strip_markdown(text: str) -> str:
     """Strip markdown formatting to produce clean plaintext for notifications."""
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)  # code blocks (before inline code)
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)  # headings
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)  # bold
-    text = re.sub(r'\*(.+?)\*', r'\1', text)  # italic
-    text = re.sub(r'`(.+?)`', r'\1', text)  # inline code
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)  # list bullets
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)  # numbered lists
-    text = re.sub(r'!\[([^\]]*)\]\([^)]+\)', '', text)  # images (before links)
-    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)  # links
-    text = re.sub(r'^\s*>\s+', '', text, flags=re.MULTILINE)  # blockquotes
-    text = re.sub(r'\n{2,}', '\n', text)  # collapse blank lines
+    for pattern, repl in _MARKDOWN_SUBS:
+        text = pattern.sub(repl, text)
     return text.strip()
 
 
+# Notification snippets only need the start of the summary; strip markdown
+# from this much of it rather than the whole document.
+SNIPPET_LENGTH = 150
+_SNIPPET_SCAN_CHARS = 4096
+
+
+def notification_snippet(content: str) -> str:
+    """Return the first SNIPPET_LENGTH chars of plaintext, with '...' if cut.
+
+    Only a prefix of the content is stripped. The whole content is used
+    instead when the prefix ends inside a fenced code block (which would
+    otherwise survive stripping) or strips down to too little text.
+    """
+    head = content[:_SNIPPET_SCAN_CHARS]
+    truncated = len(head) < len(content)
+    plain = _strip_markdown(head)
+    if truncated and (head.count('```') % 2 or len(plain) <= SNIPPET_LENGTH):
+        plain = _strip_markdown(content)
+
+    snippet = plain[:SNIPPET_LENGTH].strip()
+    if len(plain) > SNIPPET_LENGTH:
+        snippet += '...'
+    return snippet
+
+
+def extract_markdown_title(content: str, default: str = "Daily Engineering Briefing") -> str:
+    """Return the first markdown heading as plain text, or default.
+
+    Lines are read lazily and the scan stops at the first heading, so the
+    heading near the top of a long summary is found without splitting the
+    whole document.
+    """
+    for line in io.StringIO(content):
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            return _strip_markdown(stripped.lstrip('#').strip())
+    return default
+
+
 def sanitize_html(content: str) -> str:
     """Convert markdown to HTML and sanitize to prevent XSS."""
-    raw_html = markdown.markdown(content)
-    return bleach.clean(
-        raw_html,
-        tags=ALLOWED_TAGS,
-        attributes=ALLOWED_ATTRS,
-        strip=True
-    )
+    if not content or content.isspace():
+        return ""
+    html = _markdown.render(content)
+    # Without raw HTML ("<") in the source, markdown only emits allow-listed
+    # tags plus ones that carry attributes (links, images, list starts, code
+    # languages), so output with no attributes has nothing to clean.
+    if "<" not in content and '="' not in html:
+        return html
+    return _clean_html(html)
 
 
 def render_insight_brief_html(content: str) -> str:
@@ -92,18 +269,18 @@ def render_insight_brief_html(content: str) -> str:
     parts = []
     parts.append('<div style="background:#f0f1f7;padding:16px;border-radius:12px;margin-bottom:16px">')
     parts.append('<p style="color:#5c607a;font-size:11px;text-transform:uppercase;letter-spacing:1px;margin:0 0 8px 0"><strong>KEY IDEA</strong></p>')
-    parts.append(f'<p style="font-size:18px;font-weight:600;margin:0;color:#1a1c2e">{bleach.clean(brief["key_idea"])}</p>')
+    parts.append(f'<p style="font-size:18px;font-weight:600;margin:0;color:#1a1c2e">{_clean_html(brief["key_idea"])}</p>')
     parts.append('</div>')
 
     parts.append('<div style="margin-bottom:16px">')
     parts.append('<p style="color:#5c607a;font-size:11px;text-transform:uppercase;letter-spacing:1px;margin:0 0 8px 0"><strong>WHY IT MATTERS</strong></p>')
-    parts.append(f'<p style="margin:0;color:#333">{bleach.clean(brief["why_it_matters"])}</p>')
+    parts.append(f'<p style="margin:0;color:#333">{_clean_html(brief["why_it_matters"])}</p>')
     parts.append('</div>')
 
     if brief.get("what_to_change"):
         parts.append('<div style="background:#fff3e0;padding:16px;border-radius:12px;margin-bottom:16px;border-left:4px solid #d97721">')
         parts.append('<p style="color:#d97721;font-size:11px;text-transform:uppercase;letter-spacing:1px;margin:0 0 8px 0"><strong>WHAT TO CHANGE</strong></p>')
-        parts.append(f'<p style="margin:0;color:#333">{bleach.clean(brief["what_to_change"])}</p>')
+        parts.append(f'<p style="margin:0;color:#333">{_clean_html(brief["what_to_change"])}</p>')
         parts.append('</div>')
 
     deep_dive_html = sanitize_html(brief["deep_dive"])
@@ -115,41 +292,192 @@ def render_insight_brief_html(content: str) -> str:
     return '\n'.join(parts)
 
 
+_FILENAME_PUNCTUATION = '-_. '
+# Deletes every ASCII character that isn't alphanumeric or allowed punctuation
+_UNSAFE_ASCII = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128))
+    if c not in string.ascii_letters + string.digits + _FILENAME_PUNCTUATION
+))
+
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for email subject (allow only safe chars)."""
-    return ''.join(c for c in filename if c.isalnum() or c in '-_. ')
+    # Filenames are almost always ASCII: filter them in one C-level pass
+    if filename.isascii():
+        return filename.translate(_UNSAFE_ASCII)
+    return ''.join(c for c in filename if c.isalnum() or c in _FILENAME_PUNCTUATION)
+
+
+def get_fcm_client() -> httpx.Client:
+    """Lazy-load and cache the HTTP/2 client for the FCM API.
+
+    The client is shared by all sends in a fan-out and across warm
+    invocations, so each message is a stream on an open connection rather
+    than a new TCP + TLS handshake.
+    """
+    global _fcm_client
+
+    with _fcm_client_lock:
+        if _fcm_client is None:
+            _fcm_client = httpx.Client(
+                http2=True,
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_keepalive_connections=4,
+                    max_connections=4,
+                    keepalive_expiry=600,
+                ),
+            )
+        return _fcm_client
+
+
+def reset_fcm_client():
+    """Close and clear the cached FCM HTTP client (for testing)."""
+    global _fcm_client
+
+    with _fcm_client_lock:
+        if _fcm_client is not None:
+            _fcm_client.close()
+            _fcm_client = None
+
+
+atexit.register(reset_fcm_client)
+
+
+# summaries/**/<name>.md or .json, where <name> is not empty
+_SUMMARY_FILE_PATTERN = re.compile(r'summaries/(?:.*/)?[^/]+\.(?:md|json)')
 
 
 def should_process_file(file_name: str) -> bool:
     """Check if file should be processed (summaries/*.md and summaries/*.json)."""
-    return file_name.startswith("summaries/") and (
-        file_name.endswith(".md") or file_name.endswith(".json")
-    )
+    return _SUMMARY_FILE_PATTERN.fullmatch(file_name) is not None
 
 
-def send_fcm_notification_http(token: str, title: str, body: str, article_url: str, access_token: str) -> tuple[bool, str]:
-    """Send FCM notification using HTTP v1 API."""
-    url = FCM_API_URL.format(project_id=PROJECT_ID)
+def _event_document(bucket_name: str, file_name: str, generation):
+    """Return the notifier_events document for a summary object generation."""
+    key = f"{bucket_name}/{file_name}#{generation}"
+    doc_id = hashlib.sha256(key.encode()).hexdigest()
+    return get_db().collection(PROCESSED_EVENTS_COLLECTION).document(doc_id)
+
+
+def claim_event(bucket_name: str, file_name: str, generation) -> bool:
+    """Record a summary object generation as processed.
+
+    Uses Firestore create(), which fails if the document already exists, so
+    exactly one delivery of a given generation wins even across instances.
+
+    Returns:
+        False if this generation was already processed, True otherwise
+        (including when the claim itself fails, so sends are not lost).
+    """
+    if not generation:
+        return True
+
+    try:
+        # Firestore is imported lazily (see get_db); skipped events never
+        # get here.
+        from google.cloud.firestore import SERVER_TIMESTAMP
+
+        _event_document(bucket_name, file_name, generation).create({
+            "bucket": bucket_name,
+            "name": file_name,
+            "generation": str(generation),
+            "processed_at": SERVER_TIMESTAMP,
+            TOKEN_EXPIRY_FIELD: datetime.now(timezone.utc) + PROCESSED_EVENT_TTL,
+        })
+    except AlreadyExists:
+        return False
+    except Exception as e:
+        logger.warning("Failed to record event, processing anyway", error=str(e))
+    return True
+
+
+def release_event(bucket_name: str, file_name: str, generation):
+    """Drop a claim made by claim_event so a redelivery is processed again.
+
+    Only called when processing fails before anything was delivered, so the
+    trigger's retry (deployed with --retry) sends the summary instead of
+    skipping it as a duplicate.
+    """
+    if not generation:
+        return
+
+    try:
+        _event_document(bucket_name, file_name, generation).delete()
+    except Exception as e:
+        logger.warning("Failed to release event", error=str(e))
+
+
+def fcm_error_reason(response: httpx.Response) -> str:
+    """Extract the error code from a failed FCM v1 response.
+
+    Prefers the FcmError detail's errorCode (e.g. UNREGISTERED) over the
+    coarser google.rpc status (e.g. NOT_FOUND).
+    """
+    reason = f"HTTP {response.status_code}"
+    try:
+        error = orjson.loads(response.content)["error"]
+        reason = error.get("status", reason)
+        for detail in error.get("details", ()):
+            if detail.get("errorCode"):
+                return detail["errorCode"]
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        pass
+    return reason
+
+
+def build_fcm_request(title: str, body: str, article_url: str, access_token: str) -> tuple[dict, dict]:
+    """Build the headers and message fields shared by every device.
+
+    Only the token differs between sends, so a fan-out builds these once.
+
+    Returns:
+        Tuple of (headers, message) where message lacks the 'token' key.
+    """
     headers = {
         'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json; UTF-8',
     }
-    payload = {
-        'message': {
-            'token': token,
-            'notification': {
-                'title': title,
-                'body': body,
-            },
-            'data': {
-                'article_url': article_url,
-                'click_action': 'FLUTTER_NOTIFICATION_CLICK',
-            },
-        }
+    message = {
+        'notification': {
+            'title': title,
+            'body': body,
+        },
+        'data': {
+            'article_url': article_url,
+            'click_action': 'FLUTTER_NOTIFICATION_CLICK',
+        },
     }
+    return headers, message
 
-    response = requests.post(url, headers=headers, json=payload, timeout=10)
-    return response.status_code == 200, response.text
+
+def post_fcm_notification(token: str, headers: dict, message: dict) -> tuple[bool, str]:
+    """Send a prebuilt notification to a single FCM device.
+
+    Returns:
+        Tuple of (success: bool, error_reason: str)
+    """
+    payload = {'message': {'token': token, **message}}
+    # Catch everything, as the APNs sender does: an error escaping a worker
+    # would abort the fan-out's tally and skip invalid-token cleanup.
+    try:
+        response = get_fcm_client().post(
+            FCM_SEND_URL, headers=headers, content=orjson.dumps(payload))
+        if response.status_code == 200:
+            return True, ""
+        return False, fcm_error_reason(response)
+    except Exception as e:
+        return False, str(e)
+
+
+def send_fcm_notification_http(token: str, title: str, body: str, article_url: str, access_token: str) -> tuple[bool, str]:
+    """Send FCM notification using HTTP v1 API.
+
+    Returns:
+        Tuple of (success: bool, error_reason: str)
+    """
+    headers, message = build_fcm_request(title, body, article_url, access_token)
+    return post_fcm_notification(token, headers, message)
 
 
 def send_fcm_notifications(title: str, body: str, article_url: str) -> int:
@@ -171,49 +499,57 @@ def send_fcm_notifications(title: str, body: str, article_url: str) -> int:
 
         # Get all active FCM tokens from Firestore
         db = get_db()
-        tokens_ref = db.collection("fcm_tokens").where("active", "==", True)
-        docs = tokens_ref.stream()
-
-        tokens = []
-        doc_ids = []
-        for doc in docs:
-            data = doc.to_dict()
-            if data.get("token"):
-                tokens.append(data["token"])
-                doc_ids.append(doc.id)
-
-        if not tokens:
-            logger.info("No active FCM tokens found")
-            return 0
-
-        logger.info("Sending FCM notifications", device_count=len(tokens))
-        success_count = 0
+        tokens_ref = active_tokens(db, FCM_TOKENS_COLLECTION, ["token"])
 
-        for i, token in enumerate(tokens):
-            success, response_text = send_fcm_notification_http(
-                token, title, body, article_url, access_token
-            )
-            if success:
-                success_count += 1
-            else:
-                logger.error("Failed to send FCM", device_index=i+1, error=response_text)
-                # Mark invalid tokens as inactive
-                if 'UNREGISTERED' in response_text or 'INVALID_ARGUMENT' in response_text:
-                    try:
-                        db.collection("fcm_tokens").document(doc_ids[i]).update({
-                            "active": False
-                        })
-                        logger.info("Marked FCM token as inactive", token_id=doc_ids[i])
-                    except Exception as e:
-                        logger.error("Failed to deactivate FCM token", error=str(e))
-
-        logger.info("FCM notifications complete", success=success_count, total=len(tokens))
+        headers, message = build_fcm_request(title, body, article_url, access_token)
+        success_count = 0
+        invalid_refs = []
+
+        # Sends are I/O-bound and share one thread-safe HTTP/2 client, so a
+        # thread pool runs them as concurrent streams. Each send is submitted
+        # as its document streams in, overlapping the read with the sends.
+        with ThreadPoolExecutor(max_workers=FCM_MAX_CONCURRENT_SENDS) as executor:
+            futures = {}
+            for doc in tokens_ref.stream():
+                token = doc.to_dict().get("token")
+                if not token:
+                    continue
+                future = executor.submit(
+                    post_fcm_notification, token, headers, message)
+                futures[future] = (len(futures), doc.reference)
+
+            if not futures:
+                logger.info("No active FCM tokens found")
+                return 0
+
+            logger.info("Sending FCM notifications", device_count=len(futures))
+
+            for future in as_completed(futures):
+                i, ref = futures[future]
+                success, reason = future.result()
+                if success:
+                    success_count += 1
+                else:
+                    logger.error("Failed to send FCM", device_index=i+1, reason=reason)
+                    # Mark invalid tokens as inactive
+                    if reason in FCM_INVALID_TOKEN_ERRORS:
+                        invalid_refs.append(ref)
+
+        if invalid_refs:
+            try:
+                batch_update(db, invalid_refs, {
+                    "active": False,
+                    TOKEN_EXPIRY_FIELD: inactive_token_expiry(),
+                })
+                logger.info("Marked FCM tokens as inactive", count=len(invalid_refs))
+            except Exception as e:
+                logger.error("Failed to deactivate FCM tokens", error=str(e))
+
+        logger.info("FCM notifications complete", success=success_count, total=len(futures))
         return success_count
 
     except Exception as e:
-        import traceback
-        logger.error("Error sending FCM notifications", error=str(e),
-                     traceback=traceback.format_exc())
+        logger.exception("Error sending FCM notifications", error=str(e))
         return 0
 
 
@@ -236,11 +572,36 @@ def send_summary_email(cloud_event):
         logger.info("Skipping non-summary file", file=file_name)
         return
 
+    # GCS can deliver the same finalize event more than once
+    generation = data.get("generation")
+    if not claim_event(bucket_name, file_name, generation):
+        logger.info("Skipping duplicate event", file=file_name,
+                    generation=generation)
+        return
+
+    try:
+        title, body, article_url = email_summary(bucket_name, file_name)
+    except Exception:
+        # Nothing has been delivered yet, so drop the claim and let the
+        # trigger's retry process the event again.
+        release_event(bucket_name, file_name, generation)
+        raise
+
+    send_push_notifications(title, body, article_url)
+
+
+def email_summary(bucket_name: str, file_name: str) -> tuple[str, str, str]:
+    """Render a summary object and send it by email.
+
+    Returns:
+        Tuple of (title, body, article_url) for the push notifications
+    """
     # Download content
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
+    bucket = get_storage_client().bucket(bucket_name)
     blob = bucket.blob(file_name)
-    content = blob.download_as_text()
+    # Summaries are UTF-8 and the transfer is already integrity-checked by
+    # TLS, so skip the client-side CRC32C pass over the whole object.
+    content = blob.download_as_bytes(checksum=None).decode("utf-8")
 
     # Determine rendering based on file type
     object_name = file_name
@@ -256,28 +617,93 @@ def send_summary_email(cloud_event):
         # Parse Markdown to HTML and sanitize to prevent XSS
         html_content = sanitize_html(content)
         # Extract title: first markdown heading only, fallback to default
-        title = "Daily Engineering Briefing"
-        for line in content.strip().split('\n'):
-            stripped = line.strip()
-            if stripped.startswith('#'):
-                title = _strip_markdown(stripped.lstrip('#').strip())
-                break
-
-    # Send Email
-    send_email(file_name, html_content)
+        title = extract_markdown_title(content)
 
     # Create snippet for notification body: strip all markdown, take first 150 chars
-    body = _strip_markdown(content)[:150].strip()
-    if len(_strip_markdown(content)) > 150:
-        body += '...'
+    body = notification_snippet(content)
 
     # Public URL for the summary
     article_url = f"https://storage.googleapis.com/{bucket_name}/{file_name}"
 
-    send_fcm_notifications(title, body, article_url)
+    # Email goes first and its failures propagate, so a failed email never
+    # leaves pushes behind that a redelivery would send again.
+    send_email(file_name, html_content)
+    return title, body, article_url
+
+
+def send_push_notifications(title: str, body: str, article_url: str):
+    """Send a summary notification to every FCM and APNs device."""
+    # FCM and APNs (iOS Swift app) are independent and log their own errors,
+    # so send them in parallel.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(send_fcm_notifications, title, body, article_url)
+        executor.submit(send_apns_notifications, title, body, article_url)
+
+
+# Fixed markup around the rendered summary in every email
+_EMAIL_HTML_PREFIX = """
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+          <h2 style="color: #2c3e50;">Your Daily Software Engineering Briefing</h2>
+          <hr style="border: 0; border-top: 1px solid #eee;">
+          """
+_EMAIL_HTML_SUFFIX = """
+          <hr style="border: 0; border-top: 1px solid #eee;">
+          <p style="font-size: 12px; color: #999;">Sent by your Cloud Agent.</p>
+        </div>
+      </body>
+    </html>
+    """
+
+
+def _get_smtp(gmail_user: str, gmail_password: str) -> smtplib.SMTP:
+    """Return a logged-in Gmail SMTP session, reusing it across invocations.
+
+    A cached session is checked with NOOP (one round trip) and replaced if
+    the server has dropped it, which is cheaper than redoing the connect,
+    STARTTLS and AUTH exchange for every email. Callers must hold _smtp_lock.
+    """
+    global _smtp
+
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        _close_smtp()
+
+    server = smtplib.SMTP("smtp.gmail.com", 587, timeout=30)
+    try:
+        server.starttls()
+        server.login(gmail_user, gmail_password)
+    except Exception:
+        server.close()
+        raise
+    _smtp = server
+    return server
+
+
+def _close_smtp():
+    """Close the cached SMTP session, ignoring errors from a dead socket."""
+    global _smtp
+
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            _smtp.close()
+        _smtp = None
+
+
+def reset_smtp():
+    """Close and clear the cached SMTP session (for testing)."""
+    with _smtp_lock:
+        _close_smtp()
 
-    # Also send APNs notifications to iOS Swift app users
-    send_apns_notifications(title, body, article_url)
+
+atexit.register(reset_smtp)
 
 
 def send_email(subject_file, html_body):
@@ -285,7 +711,7 @@ def send_email(subject_file, html_body):
     gmail_password = os.environ.get("GMAIL_APP_PASSWORD")
     dest_email = os.environ.get("DEST_EMAIL")
 
-    if not all([gmail_user, gmail_password, dest_email]):
+    if not (gmail_user and gmail_password and dest_email):
         raise ValueError("Missing environment variables (GMAIL_USER, GMAIL_APP_PASSWORD, DEST_EMAIL)")
 
     # Validate inputs
@@ -294,34 +720,48 @@ def send_email(subject_file, html_body):
     if not html_body or not isinstance(html_body, str):
         raise ValueError("Invalid html_body parameter")
 
+    recipients = [addr.strip() for addr in dest_email.split(',') if addr.strip()]
+
     # Extract date safely from filename and sanitize for email subject
     filename = subject_file.split('/')[-1].replace('.md', '')
     safe_filename = sanitize_filename(filename)
 
-    msg = MIMEMultipart("alternative")
+    full_html = _EMAIL_HTML_PREFIX + html_body + _EMAIL_HTML_SUFFIX
+
+    # The email has a single HTML part, so send it as the message itself
+    # rather than wrapped in a one-part multipart/alternative container.
+    msg = MIMEText(full_html, "html", "utf-8")
     msg["Subject"] = f"SE Daily Briefing: {safe_filename}"
     msg["From"] = gmail_user
-    msg["To"] = dest_email
-
-    full_html = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-          <h2 style="color: #2c3e50;">Your Daily Software Engineering Briefing</h2>
-          <hr style="border: 0; border-top: 1px solid #eee;">
-          {html_body}
-          <hr style="border: 0; border-top: 1px solid #eee;">
-          <p style="font-size: 12px; color: #999;">Sent by your Cloud Agent.</p>
-        </div>
-      </body>
-    </html>
-    """
-
-    msg.attach(MIMEText(full_html, "html"))
-
-    # Use context manager pattern to ensure connection is always closed
-    with smtplib.SMTP("smtp.gmail.com", 587, timeout=30) as server:
-        server.starttls()
-        server.login(gmail_user, gmail_password)
-        server.sendmail(gmail_user, dest_email, msg.as_string())
-        logger.info("Email sent successfully", recipient=dest_email)
+    msg["To"] = ", ".join(recipients)
+
+    # Serialize once, straight to CRLF bytes: sendmail passes bytes through
+    # as-is instead of re-encoding a str, and retries reuse the same payload.
+    message = msg.as_bytes(policy=SMTP_POLICY)
+    with _smtp_lock:
+        # One transaction delivers to every recipient. A cached session can
+        # still drop between the NOOP check and the send, so a disconnect
+        # gets one retry on a fresh session.
+        for attempt in range(2):
+            server = _get_smtp(gmail_user, gmail_password)
+            try:
+                server.sendmail(gmail_user, recipients, message)
+                break
+            except smtplib.SMTPServerDisconnected:
+                _close_smtp()
+                if attempt:
+                    raise
+            except Exception:
+                # Don't reuse a session left in an unknown state
+                _close_smtp()
+                raise
+    logger.info("Email sent successfully", recipients=recipients)
+
+
+# Load FCM and APNs credentials, create the Storage client and open
+# connections while the instance starts; FUNCTION_TARGET is only set by the
+# Cloud Functions runtime, so this is skipped locally and in tests.
+if os.environ.get("FUNCTION_TARGET") == "send_summary_email":
+    start_warm_up()
+    threading.Thread(target=warm_up_fcm, name="fcm-warm-up", daemon=True).start()
+    threading.Thread(target=warm_up_storage, name="storage-warm-up", daemon=True).start()
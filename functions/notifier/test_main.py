@@ -3,13 +3,19 @@
 These tests import and test the ACTUAL production functions from main.py
 to ensure tests catch any regressions in production code.
 """
+import email
 import json
 import pytest
+from contextlib import ExitStack
+from unittest.mock import ANY, MagicMock, patch
+import main
 from main import (
     sanitize_html,
     sanitize_filename,
     should_process_file,
     _strip_markdown,
+    extract_markdown_title,
+    notification_snippet,
     ALLOWED_TAGS,
     ALLOWED_ATTRS,
 )
@@ -34,6 +40,21 @@ class TestHtmlSanitization:
         assert "Hello" in result
         assert "World" in result
 
+    @pytest.mark.parametrize("url", [
+        'javascript:alert(1)', 'JavaScript:alert(1)', 'vbscript:msgbox(1)',
+        'data:text/html;base64,PHNjcmlwdD4='])
+    def test_renderer_blanks_unsafe_href(self, url):
+        """Unsafe schemes are dropped before the nh3 pass, too."""
+        rendered = main._markdown.render(f'[x](<{url}>)')
+        assert 'href=""' in rendered
+
+    def test_renderer_keeps_safe_href(self):
+        rendered = main._markdown.render(
+            '[a](https://example.com/p) [b](mailto:me@example.com) [c](/rel)')
+        assert 'href="https://example.com/p"' in rendered
+        assert 'href="mailto:me@example.com"' in rendered
+        assert 'href="/rel"' in rendered
+
     def test_xss_javascript_url_removed(self):
         """Test that javascript: URLs are sanitized."""
         content = '[Click me](javascript:alert("xss"))'
@@ -66,6 +87,27 @@ class TestHtmlSanitization:
         assert "<ul>" in result
         assert "<li>" in result
 
+    def test_empty_content(self):
+        """Empty or whitespace-only content renders to nothing."""
+        assert sanitize_html("") == ""
+        assert sanitize_html(" \n\t\n") == ""
+
+    def test_plain_markdown_skips_cleaner(self):
+        """Attribute-free markdown output is returned without cleaning."""
+        content = "# Title\n\nSome **bold** & `code`\n\n- a\n- b\n\n> quote"
+        with patch.object(main, "_clean_html") as mock_clean:
+            result = sanitize_html(content)
+
+        mock_clean.assert_not_called()
+        assert result == main._markdown.render(content)
+        assert "&amp;" in result
+
+    def test_attributes_still_cleaned(self):
+        """Markdown that emits attributes goes through the cleaner."""
+        result = sanitize_html("3. three\n\n```python\nx\n```")
+        assert "start=" not in result
+        assert "class=" not in result
+
     def test_allowed_tags_match_production(self):
         """Verify test uses same allowed tags as production."""
         expected_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li',
@@ -110,6 +152,12 @@ class TestFilenameSanitization:
         assert "🎉" not in result
         assert "summary-2024" in result
 
+    def test_ascii_fast_path_matches_slow_path(self):
+        """The translate table keeps exactly the ASCII chars the filter keeps."""
+        every_ascii = ''.join(map(chr, range(128)))
+        expected = ''.join(c for c in every_ascii if c.isalnum() or c in '-_. ')
+        assert sanitize_filename(every_ascii) == expected
+
 
 class TestFileFiltering:
     """Tests for file path filtering."""
@@ -145,6 +193,11 @@ class TestFileFiltering:
         """Test that folder itself is not processed."""
         assert not should_process_file("summaries/")
 
+    def test_extension_without_name_rejected(self):
+        """Test that bare extensions are not treated as summaries."""
+        assert not should_process_file("summaries/.md")
+        assert not should_process_file("summaries/archive/.json")
+
 
 class TestStripMarkdown:
     """Tests for notification text cleaning."""
@@ -199,6 +252,491 @@ class TestStripMarkdown:
         assert "The Real Title" in result
 
 
+class TestExtractMarkdownTitle:
+    """Tests for notification title extraction."""
+
+    def test_skips_preamble(self):
+        content = "Here is a compact, educational summary.\n\n# The Real Title\n\nBody."
+        assert extract_markdown_title(content) == "The Real Title"
+
+    def test_strips_heading_markdown(self):
+        assert extract_markdown_title("\n## **Bold** `code`\n") == "Bold code"
+
+    def test_default_without_heading(self):
+        assert extract_markdown_title("No headings here.") == "Daily Engineering Briefing"
+
+
+class TestNotificationSnippet:
+    """Tests for the notification body snippet."""
+
+    def _full_strip_snippet(self, content):
+        plain = _strip_markdown(content)
+        return plain[:150].strip() + ('...' if len(plain) > 150 else '')
+
+    def test_short_content_not_truncated(self):
+        assert notification_snippet("# Title\n\nShort **body**.") == "Title\nShort body."
+
+    def test_long_content_matches_full_strip(self):
+        content = "# Title\n\n" + "Some **bold** and `code` text. " * 500
+        assert notification_snippet(content) == self._full_strip_snippet(content)
+
+    def test_code_block_crossing_scan_window(self):
+        content = "Intro.\n\n```\n" + "x = 1\n" * 1000 + "```\n\nAfter the code."
+        snippet = notification_snippet(content)
+        assert "x = 1" not in snippet
+        assert snippet == self._full_strip_snippet(content)
+
+
+class TestAccessToken:
+    """Tests for FCM access token caching."""
+
+    def setup_method(self):
+        main.reset_access_token()
+
+    def teardown_method(self):
+        main.reset_access_token()
+
+    def test_reuses_valid_credentials(self):
+        creds = MagicMock(valid=True, token="cached-token")
+        with patch.object(
+            main.google.auth, "default", return_value=(creds, "proj")
+        ) as mock_default:
+            assert main.get_access_token() == "cached-token"
+            assert main.get_access_token() == "cached-token"
+
+        mock_default.assert_called_once()
+        creds.refresh.assert_not_called()
+
+    def test_refreshes_invalid_credentials(self):
+        creds = MagicMock(valid=False, token="fresh-token")
+        with patch.object(
+            main.google.auth, "default", return_value=(creds, "proj")
+        ):
+            assert main.get_access_token() == "fresh-token"
+
+        creds.refresh.assert_called_once()
+
+    def test_warm_up_swallows_errors(self):
+        with patch.object(
+            main.google.auth, "default", side_effect=RuntimeError("no adc")
+        ):
+            main.warm_up_fcm()
+
+
+class TestSendFcmNotifications:
+    """Tests for the FCM fan-out."""
+
+    def _mock_db(self, tokens):
+        db = MagicMock()
+        docs = []
+        for i, token in enumerate(tokens):
+            doc = MagicMock()
+            doc.id = f"doc{i}"
+            doc.to_dict.return_value = {"token": token}
+            docs.append(doc)
+        db.collection.return_value.where.return_value.select.return_value \
+            .stream.return_value = docs
+        return db
+
+    def test_sends_to_every_token(self):
+        db = self._mock_db(["t1", "t2", "t3"])
+        with patch.object(main, "get_access_token", return_value="tok"), \
+                patch.object(main, "get_db", return_value=db), \
+                patch.object(
+                    main, "post_fcm_notification",
+                    side_effect=lambda token, *a: (token != "t2", "")
+                ) as mock_send:
+            sent = main.send_fcm_notifications("T", "B", "https://x")
+
+        assert sent == 2
+        db.collection.return_value.where.return_value.select.assert_called_once_with(
+            ["token"])
+        assert sorted(c.args[0] for c in mock_send.call_args_list) == [
+            "t1", "t2", "t3"]
+
+    def test_batches_invalid_token_deactivation(self):
+        db = self._mock_db(["t1", "t2", "t3"])
+        with patch.object(main, "get_access_token", return_value="tok"), \
+                patch.object(main, "get_db", return_value=db), \
+                patch.object(
+                    main, "post_fcm_notification",
+                    return_value=(False, "UNREGISTERED")):
+            main.send_fcm_notifications("T", "B", "https://x")
+
+        batch = db.batch.return_value
+        assert batch.update.call_count == 3
+        batch.commit.assert_called_once()
+
+    def test_transport_error_is_a_failed_send(self):
+        client = MagicMock()
+        client.post.side_effect = main.httpx.ConnectError("boom")
+        with patch.object(main, "get_fcm_client", return_value=client):
+            success, text = main.send_fcm_notification_http(
+                "t1", "T", "B", "https://x", "tok")
+
+        assert success is False
+        assert "boom" in text
+
+    def test_unexpected_worker_error_is_a_failed_send(self):
+        db = self._mock_db(["t1", "t2"])
+        client = MagicMock()
+        client.post.side_effect = [
+            main.httpx.Response(404, content=json.dumps({"error": {
+                "status": "NOT_FOUND",
+                "details": [{"errorCode": "UNREGISTERED"}]}})),
+            ValueError("bad header"),
+        ]
+        with patch.object(main, "get_access_token", return_value="tok"), \
+                patch.object(main, "get_db", return_value=db), \
+                patch.object(main, "get_fcm_client", return_value=client):
+            assert main.send_fcm_notifications("T", "B", "https://x") == 0
+
+        db.batch.return_value.update.assert_called_once()
+
+    def test_builds_request_once_per_fan_out(self):
+        db = self._mock_db(["t1", "t2"])
+        with patch.object(main, "get_access_token", return_value="tok"), \
+                patch.object(main, "get_db", return_value=db), \
+                patch.object(
+                    main, "post_fcm_notification", return_value=(True, "")
+                ) as mock_post:
+            main.send_fcm_notifications("T", "B", "https://x")
+
+        (_, headers1, message1), (_, headers2, message2) = [
+            c.args for c in mock_post.call_args_list]
+        assert headers1 is headers2
+        assert message1 is message2
+        assert headers1["Authorization"] == "Bearer tok"
+        assert message1["notification"] == {"title": "T", "body": "B"}
+
+    def test_payload_carries_token(self):
+        client = MagicMock()
+        client.post.return_value.status_code = 200
+        headers, message = main.build_fcm_request("T", "B", "https://x", "tok")
+        with patch.object(main, "get_fcm_client", return_value=client):
+            assert main.post_fcm_notification("t1", headers, message) == (True, "")
+
+        payload = json.loads(client.post.call_args.kwargs["content"])
+        assert payload["message"]["token"] == "t1"
+        assert payload["message"]["data"]["article_url"] == "https://x"
+        assert "token" not in message
+
+    def test_bare_not_found_keeps_tokens(self):
+        """A 404 without an FcmError detail is not a token problem."""
+        db = self._mock_db(["t1", "t2"])
+        client = MagicMock()
+        client.post.return_value = main.httpx.Response(
+            404, content=json.dumps({"error": {"status": "NOT_FOUND"}}))
+        with patch.object(main, "get_access_token", return_value="tok"), \
+                patch.object(main, "get_db", return_value=db), \
+                patch.object(main, "get_fcm_client", return_value=client):
+            assert main.send_fcm_notifications("T", "B", "https://x") == 0
+
+        db.batch.assert_not_called()
+
+    def test_keeps_tokens_on_transient_errors(self):
+        db = self._mock_db(["t1"])
+        with patch.object(main, "get_access_token", return_value="tok"), \
+                patch.object(main, "get_db", return_value=db), \
+                patch.object(
+                    main, "post_fcm_notification",
+                    return_value=(False, "UNAVAILABLE")):
+            main.send_fcm_notifications("T", "B", "https://x")
+
+        db.batch.assert_not_called()
+
+
+class TestFcmErrorReason:
+    """Tests for FCM error response parsing."""
+
+    def _response(self, status_code, content):
+        return main.httpx.Response(status_code, content=content)
+
+    def test_prefers_fcm_error_code(self):
+        response = self._response(404, json.dumps({"error": {
+            "status": "NOT_FOUND",
+            "details": [{
+                "@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError",
+                "errorCode": "UNREGISTERED",
+            }],
+        }}))
+        assert main.fcm_error_reason(response) == "UNREGISTERED"
+
+    def test_falls_back_to_status(self):
+        response = self._response(
+            400, json.dumps({"error": {"status": "INVALID_ARGUMENT"}}))
+        assert main.fcm_error_reason(response) == "INVALID_ARGUMENT"
+
+    def test_non_json_body(self):
+        assert main.fcm_error_reason(self._response(502, b"Bad Gateway")) == "HTTP 502"
+
+    def test_token_text_does_not_match(self):
+        """A status string inside another field must not count as the reason."""
+        response = self._response(500, json.dumps({"error": {
+            "status": "INTERNAL", "message": "token UNREGISTERED-ish"}}))
+        assert main.fcm_error_reason(response) == "INTERNAL"
+
+
+class TestGetStorageClient:
+    """Tests for Cloud Storage client caching."""
+
+    def teardown_method(self):
+        main.reset_storage_client()
+
+    def test_reuses_client(self):
+        main.reset_storage_client()
+        with patch.object(main.storage, "Client") as mock_cls:
+            first = main.get_storage_client()
+            second = main.get_storage_client()
+
+        mock_cls.assert_called_once()
+        assert first is second
+
+    def test_warm_up_creates_client_only(self):
+        main.reset_storage_client()
+        with patch.object(main.storage, "Client") as mock_cls, \
+                patch.object(main.smtplib, "SMTP") as mock_smtp:
+            main.warm_up_storage()
+            main.get_storage_client()
+
+        mock_cls.assert_called_once()
+        mock_smtp.assert_not_called()
+
+    def test_warm_up_swallows_errors(self):
+        main.reset_storage_client()
+        with patch.object(main.storage, "Client",
+                          side_effect=RuntimeError("no adc")):
+            main.warm_up_storage()
+
+
+class TestClaimEvent:
+    """Tests for duplicate GCS event detection."""
+
+    def test_first_delivery_is_claimed(self):
+        db = MagicMock()
+        with patch.object(main, "get_db", return_value=db):
+            assert main.claim_event("bucket", "summaries/a.md", "123") is True
+
+        doc = db.collection.return_value.document.return_value
+        doc.create.assert_called_once()
+        assert doc.create.call_args.args[0]["generation"] == "123"
+
+    def test_redelivery_is_rejected(self):
+        db = MagicMock()
+        db.collection.return_value.document.return_value.create.side_effect = (
+            main.AlreadyExists("exists"))
+        with patch.object(main, "get_db", return_value=db):
+            assert main.claim_event("bucket", "summaries/a.md", "123") is False
+
+    def test_new_generation_gets_new_document(self):
+        db = MagicMock()
+        with patch.object(main, "get_db", return_value=db):
+            main.claim_event("bucket", "summaries/a.md", "1")
+            main.claim_event("bucket", "summaries/a.md", "2")
+
+        first, second = db.collection.return_value.document.call_args_list
+        assert first != second
+
+    def test_firestore_error_does_not_block_processing(self):
+        db = MagicMock()
+        db.collection.return_value.document.return_value.create.side_effect = (
+            RuntimeError("unavailable"))
+        with patch.object(main, "get_db", return_value=db):
+            assert main.claim_event("bucket", "summaries/a.md", "123") is True
+
+    def test_release_deletes_claim(self):
+        db = MagicMock()
+        with patch.object(main, "get_db", return_value=db):
+            main.claim_event("bucket", "summaries/a.md", "123")
+            main.release_event("bucket", "summaries/a.md", "123")
+
+        claimed, released = db.collection.return_value.document.call_args_list
+        assert claimed == released
+        db.collection.return_value.document.return_value.delete.assert_called_once()
+
+
+class TestSendSummaryEmail:
+    """Tests for the GCS event handler."""
+
+    def _event(self, name="summaries/2024-01-01.md"):
+        event = MagicMock()
+        event.data = {"bucket": "bucket", "name": name, "generation": "1"}
+        event.__getitem__.side_effect = {"id": "evt", "type": "finalized"}.get
+        return event
+
+    def _patch_handler(self, stack, content="# Title\n\nBody text", **overrides):
+        blob = MagicMock()
+        blob.download_as_bytes.return_value = content.encode()
+        storage_client = MagicMock()
+        storage_client.bucket.return_value.blob.return_value = blob
+        patches = {
+            "claim_event": MagicMock(return_value=True),
+            "release_event": MagicMock(),
+            "send_email": MagicMock(),
+            "send_fcm_notifications": MagicMock(return_value=1),
+            "send_apns_notifications": MagicMock(return_value=1),
+        }
+        patches.update(overrides)
+        stack.enter_context(
+            patch.object(main, "get_storage_client", return_value=storage_client))
+        for name, mock in patches.items():
+            stack.enter_context(patch.object(main, name, mock))
+        return {**patches, "blob": blob}
+
+    def test_sends_all_channels(self):
+        with ExitStack() as stack:
+            mocks = self._patch_handler(stack)
+            main.send_summary_email(self._event())
+
+        mocks["send_email"].assert_called_once()
+        mocks["send_fcm_notifications"].assert_called_once_with(
+            "Title", ANY,
+            "https://storage.googleapis.com/bucket/summaries/2024-01-01.md")
+        mocks["send_apns_notifications"].assert_called_once()
+        mocks["blob"].download_as_bytes.assert_called_once_with(checksum=None)
+
+    def test_long_summary_snippet_is_truncated(self):
+        with ExitStack() as stack:
+            mocks = self._patch_handler(
+                stack, content="# Title\n\n" + "**word** " * 100)
+            main.send_summary_email(self._event())
+
+        body = mocks["send_fcm_notifications"].call_args.args[1]
+        assert body.endswith("...")
+        assert len(body) <= 153
+        assert "*" not in body
+
+    def test_email_failure_skips_pushes(self):
+        with ExitStack() as stack:
+            mocks = self._patch_handler(
+                stack, send_email=MagicMock(side_effect=ValueError("no smtp")))
+            with pytest.raises(ValueError):
+                main.send_summary_email(self._event())
+
+        mocks["send_fcm_notifications"].assert_not_called()
+        mocks["send_apns_notifications"].assert_not_called()
+        mocks["release_event"].assert_called_once_with(
+            "bucket", "summaries/2024-01-01.md", "1")
+
+    def test_failed_delivery_is_processed_again(self):
+        claimed = set()
+        doc_ids = []
+
+        def document(doc_id):
+            doc_ids.append(doc_id)
+            doc = MagicMock()
+
+            def create(data):
+                if doc_id in claimed:
+                    raise main.AlreadyExists("exists")
+                claimed.add(doc_id)
+
+            doc.create.side_effect = create
+            doc.delete.side_effect = lambda: claimed.discard(doc_id)
+            return doc
+
+        db = MagicMock()
+        db.collection.return_value.document.side_effect = document
+        send_email = MagicMock(side_effect=[ValueError("no smtp"), None])
+        with ExitStack() as stack:
+            mocks = self._patch_handler(
+                stack, claim_event=main.claim_event,
+                release_event=main.release_event, send_email=send_email)
+            stack.enter_context(patch.object(main, "get_db", return_value=db))
+            with pytest.raises(ValueError):
+                main.send_summary_email(self._event())
+            main.send_summary_email(self._event())
+            main.send_summary_email(self._event())
+
+        assert send_email.call_count == 2
+        mocks["send_fcm_notifications"].assert_called_once()
+        assert len(set(doc_ids)) == 1
+
+
+class TestSendEmail:
+    """Tests for SMTP session reuse."""
+
+    @pytest.fixture(autouse=True)
+    def env(self, monkeypatch):
+        monkeypatch.setenv("GMAIL_USER", "from@example.com")
+        monkeypatch.setenv("GMAIL_APP_PASSWORD", "secret")
+        monkeypatch.setenv("DEST_EMAIL", "to@example.com")
+        main.reset_smtp()
+        yield
+        main.reset_smtp()
+
+    def test_reuses_session_across_emails(self):
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            server = mock_smtp.return_value
+            server.noop.return_value = (250, b"OK")
+            main.send_email("summaries/a.md", "<p>a</p>")
+            main.send_email("summaries/b.md", "<p>b</p>")
+
+        mock_smtp.assert_called_once()
+        server.login.assert_called_once()
+        assert server.sendmail.call_count == 2
+
+    def test_reconnects_dropped_session(self):
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            stale, fresh = MagicMock(), MagicMock()
+            stale.noop.side_effect = main.smtplib.SMTPServerDisconnected()
+            mock_smtp.side_effect = [stale, fresh]
+            main.send_email("summaries/a.md", "<p>a</p>")
+            main.send_email("summaries/b.md", "<p>b</p>")
+
+        assert mock_smtp.call_count == 2
+        fresh.sendmail.assert_called_once()
+
+    def test_sends_single_html_part(self):
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            main.send_email("summaries/2024-01-01.md", "<p>Hello</p>")
+
+        sent = email.message_from_bytes(
+            mock_smtp.return_value.sendmail.call_args.args[2])
+        assert sent.get_content_type() == "text/html"
+        assert sent["Subject"] == "SE Daily Briefing: 2024-01-01"
+        assert "<p>Hello</p>" in sent.get_payload(decode=True).decode()
+
+    def test_sends_crlf_bytes(self):
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            main.send_email("summaries/2024-01-01.md", "<p>Hello</p>")
+
+        message = mock_smtp.return_value.sendmail.call_args.args[2]
+        assert isinstance(message, bytes)
+        assert b"\r\n" in message
+        assert b"\n" not in message.replace(b"\r\n", b"")
+
+    def test_multiple_recipients_in_one_send(self, monkeypatch):
+        monkeypatch.setenv("DEST_EMAIL", "a@example.com, b@example.com")
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            main.send_email("summaries/a.md", "<p>a</p>")
+
+        server = mock_smtp.return_value
+        server.sendmail.assert_called_once()
+        assert server.sendmail.call_args.args[1] == [
+            "a@example.com", "b@example.com"]
+
+    def test_retries_once_on_disconnect_during_send(self):
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            stale, fresh = MagicMock(), MagicMock()
+            stale.sendmail.side_effect = main.smtplib.SMTPServerDisconnected()
+            mock_smtp.side_effect = [stale, fresh]
+            main.send_email("summaries/a.md", "<p>a</p>")
+
+        fresh.sendmail.assert_called_once()
+
+    def test_failed_send_drops_session(self):
+        with patch.object(main.smtplib, "SMTP") as mock_smtp:
+            server = mock_smtp.return_value
+            server.sendmail.side_effect = main.smtplib.SMTPDataError(451, b"x")
+            with pytest.raises(main.smtplib.SMTPDataError):
+                main.send_email("summaries/a.md", "<p>a</p>")
+            server.sendmail.side_effect = None
+            main.send_email("summaries/b.md", "<p>b</p>")
+
+        assert mock_smtp.call_count == 2
+
+
 def test_render_insight_brief_html():
     from main import render_insight_brief_html
     content = json.dumps({
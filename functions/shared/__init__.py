@@ -5,9 +5,11 @@ secretmanager dependencies in functions that don't need them (e.g. fcm-tokens).
 Import directly from shared.apns_utils when needed.
 """
 from .logging_config import CloudFunctionLogger
-from .http_utils import cors_headers, handle_cors_preflight, json_response, error_response
+from .http_utils import (
+    cors_headers, handle_cors_preflight, json_response, error_response, get_json_body,
+)
 from .validation import TokenValidator
-from .firestore_utils import get_db, reset_db
+from .firestore_utils import get_db, reset_db, batch_update, inactive_token_expiry
 
 __all__ = [
     "CloudFunctionLogger",
@@ -15,7 +17,10 @@ __all__ = [
     "handle_cors_preflight",
     "json_response",
     "error_response",
+    "get_json_body",
     "TokenValidator",
     "get_db",
     "reset_db",
+    "batch_update",
+    "inactive_token_expiry",
 ]
@@ -2,12 +2,25 @@
 
 Provides APNs credential loading, JWT creation, and notification sending
 shared across notifier and apns-notifier functions.
+
+jwt, httpx, and secretmanager are imported inside the functions that use
+them so that handlers which never send (e.g. token registration) don't pay
+for those imports on cold start.
 """
+import atexit
+import base64
+import hashlib
+import itertools
 import os
+import random
+import threading
 import time
-import jwt
-import httpx
-from google.cloud import secretmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import orjson
+from .firestore_utils import (
+    get_db, active_tokens, batch_update, inactive_token_expiry,
+    TOKEN_EXPIRY_FIELD,
+)
 from .logging_config import CloudFunctionLogger
 
 logger = CloudFunctionLogger("apns-utils")
@@ -20,77 +33,417 @@ APNS_SANDBOX_URL = os.environ.get(
 BUNDLE_ID = os.environ.get('APNS_BUNDLE_ID', 'org.tsvetkov.EngPulseSwift')
 PROJECT_ID = os.environ.get('GOOGLE_CLOUD_PROJECT', 'tsvet01')
 
+# APNs rejection reasons meaning the token will never be deliverable again;
+# tokens failing with these are deactivated. Transient or payload errors
+# (e.g. PayloadTooLarge, TooManyRequests) leave the token active.
+APNS_INVALID_TOKEN_REASONS = frozenset({
+    "BadDeviceToken",
+    "DeviceTokenNotForTopic",
+    "ExpiredToken",
+    "Unregistered",
+})
+
+# APNs rejection reasons meaning the cached provider JWT is no longer
+# accepted; the next send signs a fresh one.
+APNS_STALE_JWT_REASONS = frozenset({
+    "ExpiredProviderToken",
+    "InvalidProviderToken",
+})
+
+# Statuses APNs returns for transient conditions (throttling, server
+# errors); sends failing with these are retried on the same connection.
+APNS_RETRY_STATUSES = frozenset({429, 500, 502, 503})
+APNS_MAX_ATTEMPTS = 3
+APNS_RETRY_BASE_DELAY_SECONDS = 0.1
+APNS_MAX_RETRY_DELAY_SECONDS = 2.0
+
+# Per-RPC deadline for Secret Manager reads, so a slow cold-start fetch
+# fails fast instead of holding up the first send.
+SECRET_FETCH_TIMEOUT_SECONDS = 10.0
+
+# Upper bound on in-flight APNs requests during a fan-out
+APNS_MAX_CONCURRENT_SENDS = 32
+
+# A fan-out identical to one started on this instance within this window
+# (e.g. a redelivered or retried trigger) is suppressed.
+APNS_DEDUPE_WINDOW_SECONDS = 60
+
+# notification digest -> monotonic time its fan-out started
+_recent_fanouts = {}
+_recent_fanouts_lock = threading.Lock()
+
+# Secret Manager credentials are re-read after this long so rotated keys
+# are picked up without a redeploy.
+APNS_CREDENTIALS_TTL_SECONDS = 60 * 60
+
 _apns_key = None
 _apns_key_id = None
 _apns_team_id = None
+_apns_credentials_expire_at = 0.0
+_secret_client = None
+
+# APNs rejects provider tokens older than one hour; refresh well before that.
+APNS_JWT_TTL_SECONDS = 50 * 60
+
+# (PEM it was parsed from, loaded key)
+_apns_signing_key = None
+_jwt_token = None
+_jwt_issued_at = 0.0
+# (key_id, team_id) the cached JWT was signed for
+_jwt_signer = None
+_jwt_lock = threading.Lock()
+
+# httpx multiplexes every request to a host over one HTTP/2 connection, so
+# each endpoint gets several clients and sends rotate between them; Apple
+# recommends spreading high-volume traffic over multiple connections.
+APNS_CONNECTIONS_PER_ENDPOINT = max(
+    1, int(os.environ.get('APNS_CONNECTIONS_PER_ENDPOINT', '4')))
+
+# sandbox flag -> (clients, round-robin counter)
+_apns_clients = {}
+_apns_client_lock = threading.Lock()
+
+
+def apns_token_doc_id(token: str) -> str:
+    """Return the Firestore document ID for an APNs device token.
+
+    The 64-char hex token is hashed to 128 bits and base64url-encoded into a
+    22-char ID, shortening every indexed document path. The full token is
+    still stored in the document's "token" field for sending.
+    """
+    digest = hashlib.sha256(token.encode()).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
 
 
 def get_apns_credentials():
-    """Load APNs credentials from Secret Manager.
+    """Load APNs credentials from the environment or Secret Manager.
+
+    APNS_AUTH_KEY, APNS_KEY_ID and APNS_TEAM_ID are used when all three are
+    set; otherwise the secrets are read through the Secret Manager API and
+    re-read every APNS_CREDENTIALS_TTL_SECONDS. If a re-read fails, the
+    previously loaded credentials keep being used.
 
     Returns:
         Tuple of (auth_key, key_id, team_id) or (None, None, None) on error.
     """
-    global _apns_key, _apns_key_id, _apns_team_id
+    global _apns_key, _apns_key_id, _apns_team_id, _apns_credentials_expire_at
+    global _secret_client
 
-    if _apns_key is not None:
+    now = time.monotonic()
+    if _apns_key is not None and now < _apns_credentials_expire_at:
         return _apns_key, _apns_key_id, _apns_team_id
 
-    try:
-        client = secretmanager.SecretManagerServiceClient()
-
-        key_path = f"projects/{PROJECT_ID}/secrets/apns-auth-key/versions/latest"
-        key_response = client.access_secret_version(
-            request={"name": key_path})
-        _apns_key = key_response.payload.data.decode("UTF-8")
-
-        key_id_path = f"projects/{PROJECT_ID}/secrets/apns-key-id/versions/latest"
-        key_id_response = client.access_secret_version(
-            request={"name": key_id_path})
-        _apns_key_id = key_id_response.payload.data.decode("UTF-8").strip()
-
-        team_id_path = f"projects/{PROJECT_ID}/secrets/apns-team-id/versions/latest"
-        team_id_response = client.access_secret_version(
-            request={"name": team_id_path})
-        _apns_team_id = team_id_response.payload.data.decode("UTF-8").strip()
+    # Secrets mounted as env vars (gcloud --set-secrets) are injected by the
+    # runtime at instance start and avoid the Secret Manager round-trips.
+    env_key = os.environ.get("APNS_AUTH_KEY")
+    env_key_id = os.environ.get("APNS_KEY_ID", "").strip()
+    env_team_id = os.environ.get("APNS_TEAM_ID", "").strip()
+    if env_key and env_key_id and env_team_id:
+        _apns_key, _apns_key_id, _apns_team_id = (
+            env_key, env_key_id, env_team_id)
+        # Never expires, on purpose: the runtime only reads env-mounted
+        # secrets at instance start, so re-checking them could never pick up
+        # a rotated key. New instances see the rotation.
+        _apns_credentials_expire_at = float("inf")
+        return _apns_key, _apns_key_id, _apns_team_id
 
+    try:
+        from google.cloud import secretmanager
+
+        # Kept for the hourly refreshes so they reuse the gRPC channel.
+        if _secret_client is None:
+            _secret_client = secretmanager.SecretManagerServiceClient()
+        client = _secret_client
+
+        def access(secret_id):
+            name = f"projects/{PROJECT_ID}/secrets/{secret_id}/versions/latest"
+            response = client.access_secret_version(
+                request={"name": name}, timeout=SECRET_FETCH_TIMEOUT_SECONDS)
+            return response.payload.data.decode("UTF-8")
+
+        # The three lookups are independent RPCs; issue them together.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            key, key_id, team_id = executor.map(
+                access, ("apns-auth-key", "apns-key-id", "apns-team-id"))
+
+        # Only cache once all three have loaded, so a partial failure is
+        # retried on the next call instead of being cached.
+        _apns_key, _apns_key_id, _apns_team_id = (
+            key, key_id.strip(), team_id.strip())
+        _apns_credentials_expire_at = now + APNS_CREDENTIALS_TTL_SECONDS
         return _apns_key, _apns_key_id, _apns_team_id
     except Exception as e:
+        if _apns_key is not None:
+            # Keep sending with the current key and retry after another TTL
+            # rather than stalling every send on a failing refresh.
+            logger.warning(
+                "Failed to refresh APNs credentials, keeping cached ones",
+                error=str(e))
+            _apns_credentials_expire_at = now + APNS_CREDENTIALS_TTL_SECONDS
+            return _apns_key, _apns_key_id, _apns_team_id
         logger.error("Failed to load APNs credentials", error=str(e))
         return None, None, None
 
 
 def reset_apns_credentials():
-    """Clear the cached APNs credentials (for testing)."""
-    global _apns_key, _apns_key_id, _apns_team_id
+    """Clear the cached APNs credentials, Secret Manager client and JWT
+    (for testing)."""
+    global _apns_key, _apns_key_id, _apns_team_id, _apns_signing_key
+    global _apns_credentials_expire_at, _secret_client
+    _secret_client = None
     _apns_key = None
     _apns_key_id = None
     _apns_team_id = None
+    _apns_credentials_expire_at = 0.0
+    _apns_signing_key = None
+    reset_apns_jwt()
+
+
+def reset_apns_jwt():
+    """Drop the cached JWT so the next create_apns_jwt() signs a new one."""
+    global _jwt_token, _jwt_issued_at, _jwt_signer
+    with _jwt_lock:
+        _jwt_token = None
+        _jwt_issued_at = 0.0
+        _jwt_signer = None
+
+
+def _get_signing_key(auth_key: str):
+    """Parse the .p8 auth key into an EC private key object, once per key.
+
+    PyJWT re-parses a PEM string on every encode; handing it the loaded key
+    object skips that on each JWT refresh. A rotated key is parsed afresh.
+    Callers must hold _jwt_lock.
+    """
+    global _apns_signing_key
+
+    if _apns_signing_key is None or _apns_signing_key[0] != auth_key:
+        from cryptography.hazmat.primitives.serialization import (
+            load_pem_private_key,
+        )
+
+        _apns_signing_key = (
+            auth_key, load_pem_private_key(auth_key.encode(), password=None))
+    return _apns_signing_key[1]
 
 
 def create_apns_jwt():
-    """Create a JWT for APNs authentication.
+    """Return a JWT for APNs authentication.
+
+    The signed token is cached and reused until it is APNS_JWT_TTL_SECONDS
+    old, so a fan-out to many devices signs once instead of once per device.
+    A rotated key ID or team ID invalidates it early.
 
     Returns:
         JWT token string, or None if credentials are unavailable.
     """
-    auth_key, key_id, team_id = get_apns_credentials()
-    if not all([auth_key, key_id, team_id]):
+    global _jwt_token, _jwt_issued_at, _jwt_signer
+
+    with _jwt_lock:
+        auth_key, key_id, team_id = get_apns_credentials()
+        if not (auth_key and key_id and team_id):
+            return None
+
+        now = time.time()
+        if (_jwt_token and _jwt_signer == (key_id, team_id)
+                and now - _jwt_issued_at < APNS_JWT_TTL_SECONDS):
+            return _jwt_token
+
+        import jwt
+
+        _jwt_token = jwt.encode(
+            {
+                "iss": team_id,
+                "iat": int(now)
+            },
+            _get_signing_key(auth_key),
+            algorithm="ES256",
+            headers={
+                "alg": "ES256",
+                "kid": key_id
+            }
+        )
+        _jwt_issued_at = now
+        _jwt_signer = (key_id, team_id)
+        return _jwt_token
+
+
+def _get_apns_pool(sandbox: bool):
+    """Return the (clients, counter) pool for an endpoint, creating it once.
+
+    Callers must hold _apns_client_lock.
+    """
+    pool = _apns_clients.get(sandbox)
+    if pool is None:
+        import httpx
+
+        # APNs only speaks HTTP/2; disabling HTTP/1.1 makes a failed h2
+        # negotiation an error instead of a silent per-request fallback.
+        clients = [
+            httpx.Client(
+                base_url=APNS_SANDBOX_URL if sandbox else APNS_PRODUCTION_URL,
+                http1=False,
+                http2=True,
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_keepalive_connections=4,
+                    max_connections=8,
+                    keepalive_expiry=600,
+                ),
+            )
+            for _ in range(APNS_CONNECTIONS_PER_ENDPOINT)
+        ]
+        pool = _apns_clients[sandbox] = (clients, itertools.count())
+    return pool
+
+
+def get_apns_clients(sandbox: bool = False) -> list:
+    """Return every cached HTTP/2 client for an APNs endpoint."""
+    with _apns_client_lock:
+        return list(_get_apns_pool(sandbox)[0])
+
+
+def get_apns_client(sandbox: bool = False):
+    """Lazy-load the HTTP/2 clients for an APNs endpoint and pick the next.
+
+    Each endpoint (production or sandbox) gets APNS_CONNECTIONS_PER_ENDPOINT
+    long-lived clients whose connections stay open across sends and warm
+    invocations, so each notification is one multiplexed stream instead of
+    a fresh TCP + TLS + HTTP/2 handshake. Successive calls rotate through
+    the clients. Separate pools keep sandbox traffic from competing with
+    production for connections.
+    """
+    with _apns_client_lock:
+        clients, counter = _get_apns_pool(sandbox)
+        return clients[next(counter) % len(clients)]
+
+
+def reset_apns_client():
+    """Close and clear the cached APNs HTTP clients (for testing)."""
+    with _apns_client_lock:
+        for clients, _ in _apns_clients.values():
+            for client in clients:
+                client.close()
+        _apns_clients.clear()
+
+
+atexit.register(reset_apns_client)
+
+
+def warm_up():
+    """Prepare Firestore, APNs credentials, and the APNs connection.
+
+    Loads the credentials, signs the JWT, and opens the HTTP/2 connections
+    to the production endpoint so the first send skips that setup. Failures are
+    logged and otherwise ignored; the first send will retry the work.
+    """
+    try:
+        get_db()
+        if create_apns_jwt():
+            for client in get_apns_clients():
+                client.head("/")
+    except Exception as e:
+        logger.warning("APNs warm-up failed", error=str(e))
+
+
+def start_warm_up():
+    """Run warm_up() on a daemon thread so module import isn't blocked."""
+    threading.Thread(target=warm_up, name="apns-warm-up", daemon=True).start()
+
+
+# Request headers that are the same for every send
+_APNS_BASE_HEADERS = {
+    "apns-topic": BUNDLE_ID,
+    "apns-push-type": "alert",
+    "apns-priority": "10",
+    "content-type": "application/json",
+}
+
+
+def build_apns_request(title: str, body: str, article_url: str):
+    """Build the headers and encoded payload shared by every device.
+
+    Only the device URL differs between sends, so a fan-out builds these
+    once and reuses them for each token.
+
+    Returns:
+        Tuple of (headers, content), or None if credentials are unavailable.
+    """
+    jwt_token = create_apns_jwt()
+    if not jwt_token:
         return None
 
-    token = jwt.encode(
-        {
-            "iss": team_id,
-            "iat": int(time.time())
+    headers = {"authorization": f"bearer {jwt_token}", **_APNS_BASE_HEADERS}
+
+    content = orjson.dumps({
+        "aps": {
+            "alert": {
+                "title": title,
+                "body": body,
+            },
+            "sound": "default",
+            "badge": 1,
         },
-        auth_key,
-        algorithm="ES256",
-        headers={
-            "alg": "ES256",
-            "kid": key_id
-        }
-    )
-    return token
+        "article_url": article_url,
+    })
+    return headers, content
+
+
+def _retry_delay(response, attempt: int) -> float:
+    """Seconds to wait before retrying a send that got a transient status.
+
+    A server hint (apns-retry-after, or the generic retry-after) wins when
+    present; otherwise the delay backs off exponentially with jitter.
+    Either way it is capped.
+    """
+    hint = response.headers.get("apns-retry-after")
+    if hint is None:
+        hint = response.headers.get("retry-after")
+    try:
+        delay = float(hint)
+    except (TypeError, ValueError):
+        delay = APNS_RETRY_BASE_DELAY_SECONDS * (
+            2 ** attempt + random.random())
+    return min(max(delay, 0.0), APNS_MAX_RETRY_DELAY_SECONDS)
+
+
+def post_apns_notification(
+    token: str, headers: dict, content: bytes, sandbox: bool = False
+):
+    """Send a prebuilt notification to a single APNs device.
+
+    Sends rejected with an APNS_RETRY_STATUSES status are retried, up to
+    APNS_MAX_ATTEMPTS in all; device-level rejections are not.
+
+    Returns:
+        Tuple of (success: bool, error_reason: str)
+    """
+    try:
+        # The client's base_url selects the production or sandbox endpoint
+        client = get_apns_client(sandbox)
+        for attempt in range(APNS_MAX_ATTEMPTS):
+            response = client.post(
+                f"/3/device/{token}", headers=headers, content=content)
+            if (response.status_code not in APNS_RETRY_STATUSES
+                    or attempt == APNS_MAX_ATTEMPTS - 1):
+                break
+            time.sleep(_retry_delay(response, attempt))
+
+        if response.status_code == 200:
+            return True, ""
+
+        # Only rejections carry a body ({"reason": ...}); success returns
+        # above without decoding anything.
+        reason = f"HTTP {response.status_code}"
+        if response.content:
+            try:
+                reason = orjson.loads(response.content).get("reason", reason)
+            except (orjson.JSONDecodeError, AttributeError):
+                pass
+        return False, reason
+
+    except Exception as e:
+        return False, str(e)
 
 
 def send_apns_notification(
@@ -103,45 +456,46 @@ def send_apns_notification(
         Tuple of (success: bool, error_reason: str)
     """
     try:
-        jwt_token = create_apns_jwt()
-        if not jwt_token:
-            return False, "No APNs credentials"
-
-        endpoint = APNS_SANDBOX_URL if sandbox else APNS_PRODUCTION_URL
-        url = f"{endpoint}/3/device/{token}"
-
-        headers = {
-            "authorization": f"bearer {jwt_token}",
-            "apns-topic": BUNDLE_ID,
-            "apns-push-type": "alert",
-            "apns-priority": "10",
-        }
-
-        payload = {
-            "aps": {
-                "alert": {
-                    "title": title,
-                    "body": body,
-                },
-                "sound": "default",
-                "badge": 1,
-            },
-            "article_url": article_url,
-        }
-
-        with httpx.Client(http2=True, timeout=10.0) as client:
-            response = client.post(url, headers=headers, json=payload)
-            if response.status_code == 200:
-                return True, ""
-            try:
-                error_data = response.json() if response.content else {}
-                reason = error_data.get("reason", f"HTTP {response.status_code}")
-            except (ValueError, TypeError):
-                reason = f"HTTP {response.status_code}"
-            return False, reason
-
+        request = build_apns_request(title, body, article_url)
     except Exception as e:
         return False, str(e)
+    if request is None:
+        return False, "No APNs credentials"
+
+    headers, content = request
+    return post_apns_notification(token, headers, content, sandbox)
+
+
+def _fanout_key(title: str, body: str, article_url: str) -> bytes:
+    """Digest identifying a notification for duplicate suppression."""
+    return hashlib.blake2b(
+        "\0".join((title, body, article_url)).encode(),
+        digest_size=16).digest()
+
+
+def _claim_fanout(key: bytes) -> bool:
+    """Record a fan-out; False if the same one started within the window."""
+    now = time.monotonic()
+    with _recent_fanouts_lock:
+        for stale in [k for k, started in _recent_fanouts.items()
+                      if now - started >= APNS_DEDUPE_WINDOW_SECONDS]:
+            del _recent_fanouts[stale]
+        if key in _recent_fanouts:
+            return False
+        _recent_fanouts[key] = now
+        return True
+
+
+def _release_fanout(key: bytes):
+    """Forget a fan-out that failed, so a retry isn't suppressed."""
+    with _recent_fanouts_lock:
+        _recent_fanouts.pop(key, None)
+
+
+def reset_recent_fanouts():
+    """Forget recent fan-outs so none are suppressed (for testing)."""
+    with _recent_fanouts_lock:
+        _recent_fanouts.clear()
 
 
 def send_apns_notifications(
@@ -158,55 +512,94 @@ def send_apns_notifications(
     Returns:
         Number of notifications sent successfully
     """
+    key = _fanout_key(title, body, article_url)
+    if not _claim_fanout(key):
+        logger.info("Suppressed duplicate APNs notifications", title=title)
+        return 0
+
     try:
+        request = build_apns_request(title, body, article_url)
+        if request is None:
+            logger.error("Skipping APNs notifications: no APNs credentials")
+            _release_fanout(key)
+            return 0
+        headers, content = request
+
         if db is None:
-            from .firestore_utils import get_db
             db = get_db()
 
-        tokens_ref = db.collection(
-            APNS_TOKENS_COLLECTION).where("active", "==", True)
-        docs = list(tokens_ref.stream())
-
-        if not docs:
-            logger.info("No active APNs tokens found")
-            return 0
+        tokens_ref = active_tokens(
+            db, APNS_TOKENS_COLLECTION, ["token", "sandbox"])
 
-        logger.info("Sending APNs notifications", device_count=len(docs))
         success_count = 0
-
-        for doc in docs:
-            data = doc.to_dict()
-            token = data.get("token")
-            sandbox = data.get("sandbox", False)
-
-            if not token:
-                continue
-
-            success, reason = send_apns_notification(
-                token, title, body, article_url, sandbox)
-
-            if success:
-                success_count += 1
-            else:
-                logger.error("Failed to send APNs", reason=reason)
-                if reason in (
-                    "BadDeviceToken", "Unregistered", "ExpiredToken"
-                ):
-                    try:
-                        doc.reference.update({"active": False})
-                        logger.info("Marked APNs token as inactive")
-                    except Exception as e:
-                        logger.error(
-                            "Failed to deactivate APNs token",
-                            error=str(e))
+        invalid_refs = []
+        stale_jwt = False
+
+        # Sends are I/O-bound and the shared HTTP/2 client is thread-safe,
+        # so a thread pool multiplexes them as concurrent streams. Sends
+        # start as soon as the first page of tokens arrives.
+        with ThreadPoolExecutor(max_workers=APNS_MAX_CONCURRENT_SENDS) as executor:
+            futures = {}
+            for doc in tokens_ref.stream():
+                data = doc.to_dict()
+                token = data.get("token")
+                sandbox = data.get("sandbox", False)
+
+                if not token:
+                    continue
+
+                future = executor.submit(
+                    post_apns_notification,
+                    token, headers, content, sandbox)
+                futures[future] = doc.reference
+
+            if not futures:
+                logger.info("No active APNs tokens found")
+                _release_fanout(key)
+                return 0
+
+            logger.info("Sending APNs notifications", device_count=len(futures))
+
+            for future in as_completed(futures):
+                ref = futures[future]
+                success, reason = future.result()
+
+                if success:
+                    success_count += 1
+                else:
+                    logger.error("Failed to send APNs", reason=reason)
+                    if reason in APNS_INVALID_TOKEN_REASONS:
+                        invalid_refs.append(ref)
+                    elif reason in APNS_STALE_JWT_REASONS:
+                        stale_jwt = True
+
+        if stale_jwt:
+            reset_apns_jwt()
+
+        # A fan-out that delivered nothing, or was sent with a JWT APNs has
+        # rejected, is worth retrying right away, not suppressing.
+        if stale_jwt or not success_count:
+            _release_fanout(key)
+
+        if invalid_refs:
+            try:
+                batch_update(db, invalid_refs, {
+                    "active": False,
+                    TOKEN_EXPIRY_FIELD: inactive_token_expiry(),
+                })
+                logger.info(
+                    "Marked APNs tokens as inactive",
+                    count=len(invalid_refs))
+            except Exception as e:
+                logger.error(
+                    "Failed to deactivate APNs tokens", error=str(e))
 
         logger.info(
             "APNs notifications complete",
-            success=success_count, total=len(docs))
+            success=success_count, total=len(futures))
         return success_count
 
     except Exception as e:
-        import traceback
-        logger.error("Error sending APNs notifications", error=str(e),
-                     traceback=traceback.format_exc())
+        logger.exception("Error sending APNs notifications", error=str(e))
+        _release_fanout(key)
         return 0
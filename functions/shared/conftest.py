@@ -24,7 +24,7 @@ def mock_secret_manager():
             return resp
 
         mock_client.access_secret_version.side_effect = (
-            lambda request: {
+            lambda request, **kwargs: {
                 "projects/tsvet01/secrets/apns-auth-key/versions/latest":
                     make_secret_response("fake-key-content"),
                 "projects/tsvet01/secrets/apns-key-id/versions/latest":
@@ -42,7 +42,5 @@ def mock_httpx():
     """Mock httpx Client for APNs HTTP/2 calls."""
     with patch("httpx.Client") as mock_cls:
         mock_client = MagicMock()
-        mock_cls.return_value.__enter__ = MagicMock(
-            return_value=mock_client)
-        mock_cls.return_value.__exit__ = MagicMock(return_value=False)
+        mock_cls.return_value = mock_client
         yield mock_client
@@ -1,8 +1,21 @@
 """Shared Firestore utilities for Google Cloud Functions.
 
 Provides a lazy-loaded, cached Firestore client shared across all functions.
+google.cloud.firestore is imported on first use to keep it off the import
+path of modules that only need the helpers.
 """
-from google.cloud import firestore
+from datetime import datetime, timedelta, timezone
+
+
+FCM_TOKENS_COLLECTION = "fcm_tokens"
+
+# Firestore rejects commits with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Soft-deleted token documents carry this timestamp field; a Firestore TTL
+# policy on it (see the deploy scripts) deletes them server-side.
+TOKEN_EXPIRY_FIELD = "expire_at"
+INACTIVE_TOKEN_TTL = timedelta(days=90)
 
 _db = None
 
@@ -11,6 +24,8 @@ def get_db():
     """Lazy-load and cache Firestore client."""
     global _db
     if _db is None:
+        from google.cloud import firestore
+
         _db = firestore.Client()
     return _db
 
@@ -19,3 +34,47 @@ def reset_db():
     """Clear the cached Firestore client (for testing)."""
     global _db
     _db = None
+
+
+def active_tokens(db, collection, fields):
+    """Query the active token documents of a collection, projected to fields.
+
+    Only the listed fields are returned, so read size doesn't grow with
+    whatever else is stored on the token documents.
+    """
+    from google.cloud.firestore import FieldFilter
+
+    return db.collection(collection).where(
+        filter=FieldFilter("active", "==", True)).select(fields)
+
+
+def batch_update(db, refs, data):
+    """Apply the same update to many documents in as few commits as possible.
+
+    Each commit is atomic, so a failing chunk (e.g. one containing a document
+    deleted since it was read) is skipped rather than stopping the chunks
+    after it; the first error is raised once every chunk has been tried.
+
+    Args:
+        db: Firestore client
+        refs: Document references to update
+        data: Field updates applied to every document
+    """
+    error = None
+    for start in range(0, len(refs), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for ref in refs[start:start + MAX_BATCH_WRITES]:
+            batch.update(ref, data)
+        try:
+            batch.commit()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+
+def inactive_token_expiry(now=None):
+    """Return when a token deactivated at `now` becomes eligible for deletion."""
+    if now is None:
+        now = datetime.now(timezone.utc)
+    return now + INACTIVE_TOKEN_TTL
@@ -3,9 +3,12 @@
 Provides common CORS handling and response formatting utilities
 to ensure consistent API behavior across all Cloud Functions.
 """
-from flask import jsonify
+from functools import lru_cache
 from typing import Any, Dict, Tuple
 
+import orjson
+from flask import Request, Response
+
 # Standard CORS headers for API responses
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -14,14 +17,23 @@ CORS_HEADERS = {
     "Access-Control-Max-Age": "3600",
 }
 
+# Shared across responses rather than rebuilt per request; Flask copies
+# header dicts into the response, so these are never mutated. They stay
+# plain dicts because Flask only accepts dict-like headers of known types.
+_ALLOW_ORIGIN_HEADERS = {"Access-Control-Allow-Origin": "*"}
+_PREFLIGHT_RESPONSE = ("", 204, CORS_HEADERS)
+
 
 def cors_headers() -> Dict[str, str]:
     """Return standard CORS headers for regular responses.
 
+    The same dictionary is returned on every call; callers must not
+    mutate it.
+
     Returns:
         Dictionary with Access-Control-Allow-Origin header
     """
-    return {"Access-Control-Allow-Origin": "*"}
+    return _ALLOW_ORIGIN_HEADERS
 
 
 def handle_cors_preflight() -> Tuple[str, int, Dict[str, str]]:
@@ -30,7 +42,36 @@ def handle_cors_preflight() -> Tuple[str, int, Dict[str, str]]:
     Returns:
         Empty response tuple with 204 status and full CORS headers
     """
-    return ("", 204, CORS_HEADERS)
+    return _PREFLIGHT_RESPONSE
+
+
+def get_json_body(request: Request) -> Any:
+    """Parse a JSON request body with orjson.
+
+    Behaves like request.get_json(silent=True): returns None when the
+    request isn't JSON or the body is empty or malformed.
+
+    Args:
+        request: Incoming Flask request
+
+    Returns:
+        Parsed JSON value, or None
+    """
+    if not request.is_json:
+        return None
+    data = request.get_data(cache=False)
+    if not data:
+        return None
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return None
+
+
+@lru_cache(maxsize=128)
+def _error_body(message: str) -> bytes:
+    """Encode an error payload; messages repeat, so bodies are memoized."""
+    return orjson.dumps({"error": message})
 
 
 def json_response(
@@ -46,7 +87,8 @@ def json_response(
     Returns:
         Tuple of (JSON response, status, headers)
     """
-    return (jsonify(data), status, cors_headers())
+    body = orjson.dumps(data)
+    return (Response(body, mimetype="application/json"), status, cors_headers())
 
 
 def error_response(
@@ -62,4 +104,8 @@ def error_response(
     Returns:
         Tuple of (JSON error response, status, headers)
     """
-    return (jsonify({"error": message}), status, cors_headers())
+    return (
+        Response(_error_body(message), mimetype="application/json"),
+        status,
+        cors_headers(),
+    )
@@ -3,11 +3,28 @@
 Provides structured JSON logging compatible with Google Cloud Logging,
 enabling consistent log formatting and analysis across all Cloud Functions.
 """
-import logging
 import json
+import logging
 import sys
 from typing import Any
 
+import orjson
+
+_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+_DUMPS_LINE_OPTIONS = _DUMPS_OPTIONS | orjson.OPT_APPEND_NEWLINE
+
+
+def _dumps(log_obj: dict) -> str:
+    """Serialize a log entry to a JSON string."""
+    # default=str keeps a stray non-JSON value from dropping the record
+    return orjson.dumps(log_obj, default=str, option=_DUMPS_OPTIONS).decode()
+
+
+def _dumps_line(log_obj: dict) -> str:
+    """Serialize a log entry to a newline-terminated JSON string."""
+    return orjson.dumps(
+        log_obj, default=str, option=_DUMPS_LINE_OPTIONS).decode()
+
 
 class JSONFormatter(logging.Formatter):
     """JSON formatter for Cloud Functions structured logging.
@@ -48,14 +65,16 @@ class JSONFormatter(logging.Formatter):
         if record.exc_info:
             log_obj["exception"] = self.formatException(record.exc_info)
 
-        return json.dumps(log_obj)
+        return _dumps(log_obj)
 
 
 class CloudFunctionLogger:
     """Structured logger for Google Cloud Functions.
 
     Provides convenient methods for logging with structured data that
-    integrates seamlessly with Google Cloud Logging.
+    integrates seamlessly with Google Cloud Logging. Entries are written
+    straight to the handler's stream, skipping LogRecord creation and the
+    logging module's dispatch, since every call is at or above INFO.
 
     Example:
         logger = CloudFunctionLogger("my-function")
@@ -71,6 +90,7 @@ class CloudFunctionLogger:
         """
         self.component = component
         self.logger = self._setup_logger()
+        self._handler = self.logger.handlers[0]
 
     def _setup_logger(self) -> logging.Logger:
         """Configure logger with JSON formatter for Cloud Logging."""
@@ -86,6 +106,39 @@ class CloudFunctionLogger:
 
         return logger
 
+    def _write(self, severity: str, message: str, fields: dict,
+               exc_info=None) -> None:
+        """Serialize one entry and write it to the handler's stream."""
+        log_obj = {
+            "severity": severity,
+            "message": message,
+            "component": self.component,
+        }
+        log_obj.update(fields)
+        if exc_info:
+            log_obj["exception"] = self._handler.formatter.formatException(
+                exc_info)
+
+        handler = self._handler
+        try:
+            try:
+                line = _dumps_line(log_obj)
+            except TypeError:
+                # orjson rejects some values the stdlib encoder accepts,
+                # e.g. ints wider than 64 bits
+                line = json.dumps(log_obj, default=str) + "\n"
+            with handler.lock:
+                handler.stream.write(line)
+                handler.stream.flush()
+        except Exception:
+            # Like logging.Handler, report the failure on stderr rather than
+            # breaking the caller or dropping the entry without a trace.
+            handler.handleError(logging.makeLogRecord({
+                "name": self.component,
+                "levelname": severity,
+                "msg": message,
+            }))
+
     def info(self, message: str, **kwargs: Any) -> None:
         """Log info message with structured data.
 
@@ -93,24 +146,16 @@ class CloudFunctionLogger:
             message: Human-readable log message
             **kwargs: Additional structured data fields
         """
-        record = self.logger.makeRecord(
-            self.component, logging.INFO, "", 0, message, (), None
-        )
-        record.extra = kwargs
-        self.logger.handle(record)
+        self._write("INFO", message, kwargs)
 
     def error(self, message: str, **kwargs: Any) -> None:
         """Log error message with structured data.
 
         Args:
             message: Human-readable error message
-            **kwargs: Additional structured data fields (e.g., error, traceback)
+            **kwargs: Additional structured data fields (e.g., error)
         """
-        record = self.logger.makeRecord(
-            self.component, logging.ERROR, "", 0, message, (), None
-        )
-        record.extra = kwargs
-        self.logger.handle(record)
+        self._write("ERROR", message, kwargs)
 
     def warning(self, message: str, **kwargs: Any) -> None:
         """Log warning message with structured data.
@@ -119,8 +164,15 @@ class CloudFunctionLogger:
             message: Human-readable warning message
             **kwargs: Additional structured data fields
         """
-        record = self.logger.makeRecord(
-            self.component, logging.WARNING, "", 0, message, (), None
-        )
-        record.extra = kwargs
-        self.logger.handle(record)
+        self._write("WARNING", message, kwargs)
+
+    def exception(self, message: str, **kwargs: Any) -> None:
+        """Log error message with the exception currently being handled.
+
+        The traceback is rendered into the "exception" field.
+
+        Args:
+            message: Human-readable error message
+            **kwargs: Additional structured data fields
+        """
+        self._write("ERROR", message, kwargs, sys.exc_info())
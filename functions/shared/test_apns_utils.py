@@ -1,5 +1,7 @@
 """Tests for shared APNs utilities."""
-from unittest.mock import patch, MagicMock
+import json
+import pytest
+from unittest.mock import ANY, patch, MagicMock
 from shared import apns_utils
 
 
@@ -26,7 +28,7 @@ def _setup_real_key(mock_secret_manager):
         return resp
 
     mock_secret_manager.access_secret_version.side_effect = (
-        lambda request: {
+        lambda request, **kwargs: {
             "projects/tsvet01/secrets/apns-auth-key/versions/latest":
                 make_response(pem),
             "projects/tsvet01/secrets/apns-key-id/versions/latest":
@@ -37,6 +39,22 @@ def _setup_real_key(mock_secret_manager):
     )
 
 
+class TestApnsTokenDocId:
+    """Tests for apns_token_doc_id()."""
+
+    def test_fixed_length_url_safe(self):
+        doc_id = apns_utils.apns_token_doc_id("a" * 64)
+        assert len(doc_id) == 22
+        assert "/" not in doc_id
+        assert "=" not in doc_id
+
+    def test_stable_and_distinct(self):
+        assert (apns_utils.apns_token_doc_id("a" * 64)
+                == apns_utils.apns_token_doc_id("a" * 64))
+        assert (apns_utils.apns_token_doc_id("a" * 64)
+                != apns_utils.apns_token_doc_id("b" * 64))
+
+
 class TestGetApnsCredentials:
     """Tests for get_apns_credentials()."""
 
@@ -57,6 +75,12 @@ class TestGetApnsCredentials:
         apns_utils.get_apns_credentials()
         assert mock_secret_manager.access_secret_version.call_count == 3
 
+    def test_bounds_each_secret_fetch(self, mock_secret_manager):
+        apns_utils.get_apns_credentials()
+        for call in mock_secret_manager.access_secret_version.call_args_list:
+            assert call.kwargs["timeout"] == (
+                apns_utils.SECRET_FETCH_TIMEOUT_SECONDS)
+
     def test_handles_errors(self):
         with patch(
             "google.cloud.secretmanager.SecretManagerServiceClient"
@@ -68,11 +92,73 @@ class TestGetApnsCredentials:
             assert key_id is None
             assert team_id is None
 
+    def test_partial_failure_not_cached(self, mock_secret_manager):
+        fetch = mock_secret_manager.access_secret_version.side_effect
+
+        def fail_team_id(request, **kwargs):
+            if request["name"].endswith("apns-team-id/versions/latest"):
+                raise Exception("Deadline exceeded")
+            return fetch(request, **kwargs)
+
+        mock_secret_manager.access_secret_version.side_effect = fail_team_id
+        assert apns_utils.get_apns_credentials() == (None, None, None)
+
+        mock_secret_manager.access_secret_version.side_effect = fetch
+        key, key_id, team_id = apns_utils.get_apns_credentials()
+        assert (key, key_id, team_id) == (
+            "fake-key-content", "KEYID123", "TEAMID456")
+
+    def test_refreshes_after_ttl(self, mock_secret_manager):
+        from google.cloud import secretmanager
+
+        apns_utils.get_apns_credentials()
+        with patch.object(apns_utils.time, "monotonic", return_value=(
+                apns_utils._apns_credentials_expire_at + 1)):
+            apns_utils.get_apns_credentials()
+        assert mock_secret_manager.access_secret_version.call_count == 6
+        secretmanager.SecretManagerServiceClient.assert_called_once()
+
+    def test_keeps_cached_credentials_when_refresh_fails(
+        self, mock_secret_manager
+    ):
+        apns_utils.get_apns_credentials()
+        mock_secret_manager.access_secret_version.side_effect = (
+            Exception("Unavailable"))
+        expired = apns_utils._apns_credentials_expire_at + 1
+
+        with patch.object(apns_utils.time, "monotonic", return_value=expired):
+            result = apns_utils.get_apns_credentials()
+
+        assert result == ("fake-key-content", "KEYID123", "TEAMID456")
+        assert apns_utils._apns_credentials_expire_at > expired
+
     def test_returns_tuple(self, mock_secret_manager):
         result = apns_utils.get_apns_credentials()
         assert isinstance(result, tuple)
         assert len(result) == 3
 
+    def test_prefers_mounted_secrets(self, mock_secret_manager, monkeypatch):
+        monkeypatch.setenv("APNS_AUTH_KEY", "env-key-content")
+        monkeypatch.setenv("APNS_KEY_ID", "ENVKEYID\n")
+        monkeypatch.setenv("APNS_TEAM_ID", "ENVTEAMID\n")
+
+        key, key_id, team_id = apns_utils.get_apns_credentials()
+
+        assert key == "env-key-content"
+        assert key_id == "ENVKEYID"
+        assert team_id == "ENVTEAMID"
+        mock_secret_manager.access_secret_version.assert_not_called()
+
+    def test_partial_env_falls_back_to_secret_manager(
+        self, mock_secret_manager, monkeypatch
+    ):
+        monkeypatch.setenv("APNS_AUTH_KEY", "env-key-content")
+        monkeypatch.delenv("APNS_KEY_ID", raising=False)
+
+        key, _, _ = apns_utils.get_apns_credentials()
+
+        assert key == "fake-key-content"
+
 
 class TestCreateApnsJwt:
     """Tests for create_apns_jwt()."""
@@ -109,47 +195,106 @@ class TestCreateApnsJwt:
             token = apns_utils.create_apns_jwt()
             assert token is None
 
+    def test_caches_jwt(self, mock_secret_manager):
+        _setup_real_key(mock_secret_manager)
+
+        import jwt as pyjwt
+
+        with patch.object(
+            pyjwt, "encode", wraps=pyjwt.encode
+        ) as mock_encode:
+            first = apns_utils.create_apns_jwt()
+            second = apns_utils.create_apns_jwt()
+
+        assert first == second
+        assert mock_encode.call_count == 1
+
+    def test_resigns_when_key_id_rotates(self, mock_secret_manager):
+        _setup_real_key(mock_secret_manager)
+        first = apns_utils.create_apns_jwt()
+
+        apns_utils._apns_key_id = "NEWKEYID"
+        second = apns_utils.create_apns_jwt()
+
+        import jwt as pyjwt
+
+        assert first != second
+        assert pyjwt.get_unverified_header(second)["kid"] == "NEWKEYID"
+
+    def test_refreshes_expired_jwt(self, mock_secret_manager):
+        _setup_real_key(mock_secret_manager)
+
+        with patch.object(apns_utils.time, "time") as mock_time:
+            mock_time.return_value = 1_000_000.0
+            first = apns_utils.create_apns_jwt()
+            mock_time.return_value += apns_utils.APNS_JWT_TTL_SECONDS
+            second = apns_utils.create_apns_jwt()
+
+        assert first != second
+
+    def test_parses_signing_key_once(self, mock_secret_manager):
+        _setup_real_key(mock_secret_manager)
+
+        from cryptography.hazmat.primitives import serialization
+
+        with patch.object(
+            serialization, "load_pem_private_key",
+            wraps=serialization.load_pem_private_key
+        ) as mock_load, patch.object(apns_utils.time, "time") as mock_time:
+            mock_time.return_value = 1_000_000.0
+            apns_utils.create_apns_jwt()
+            mock_time.return_value += apns_utils.APNS_JWT_TTL_SECONDS
+            apns_utils.create_apns_jwt()
+
+        assert mock_load.call_count == 1
+
+    def test_reparses_rotated_signing_key(self):
+        first = apns_utils._get_signing_key(_make_ec_key_pem())
+        second = apns_utils._get_signing_key(_make_ec_key_pem())
+
+        assert first.private_numbers() != second.private_numbers()
+
 
 class TestSendApnsNotification:
     """Tests for send_apns_notification()."""
 
     def setup_method(self):
         apns_utils.reset_apns_credentials()
+        apns_utils.reset_apns_client()
 
     def teardown_method(self):
         apns_utils.reset_apns_credentials()
+        apns_utils.reset_apns_client()
 
-    def test_uses_production_endpoint(
-        self, mock_secret_manager, mock_httpx
-    ):
+    def test_uses_production_endpoint(self, mock_secret_manager):
         _setup_real_key(mock_secret_manager)
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_httpx.post.return_value = mock_response
+        with patch("httpx.Client") as mock_cls:
+            mock_cls.return_value.post.return_value.status_code = 200
+
+            success, _ = apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com",
+                sandbox=False
+            )
 
-        success, _ = apns_utils.send_apns_notification(
-            "a" * 64, "Title", "Body", "https://example.com",
-            sandbox=False
-        )
         assert success is True
-        call_url = mock_httpx.post.call_args[0][0]
-        assert "api.push.apple.com" in call_url
+        assert mock_cls.call_args.kwargs["base_url"] == (
+            "https://api.push.apple.com")
+        assert mock_cls.return_value.post.call_args[0][0] == (
+            "/3/device/" + "a" * 64)
 
-    def test_uses_sandbox_endpoint(
-        self, mock_secret_manager, mock_httpx
-    ):
+    def test_uses_sandbox_endpoint(self, mock_secret_manager):
         _setup_real_key(mock_secret_manager)
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_httpx.post.return_value = mock_response
+        with patch("httpx.Client") as mock_cls:
+            mock_cls.return_value.post.return_value.status_code = 200
+
+            success, _ = apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com",
+                sandbox=True
+            )
 
-        success, _ = apns_utils.send_apns_notification(
-            "a" * 64, "Title", "Body", "https://example.com",
-            sandbox=True
-        )
         assert success is True
-        call_url = mock_httpx.post.call_args[0][0]
-        assert "api.sandbox.push.apple.com" in call_url
+        assert mock_cls.call_args.kwargs["base_url"] == (
+            "https://api.sandbox.push.apple.com")
 
     def test_success_response(self, mock_secret_manager, mock_httpx):
         _setup_real_key(mock_secret_manager)
@@ -168,7 +313,6 @@ class TestSendApnsNotification:
         mock_response = MagicMock()
         mock_response.status_code = 400
         mock_response.content = b'{"reason": "BadDeviceToken"}'
-        mock_response.json.return_value = {"reason": "BadDeviceToken"}
         mock_httpx.post.return_value = mock_response
 
         success, reason = apns_utils.send_apns_notification(
@@ -177,6 +321,85 @@ class TestSendApnsNotification:
         assert success is False
         assert reason == "BadDeviceToken"
 
+    def test_failure_response_without_json_body(
+        self, mock_secret_manager, mock_httpx
+    ):
+        _setup_real_key(mock_secret_manager)
+        mock_response = MagicMock()
+        mock_response.status_code = 503
+        mock_response.content = b"Service Unavailable"
+        mock_response.headers = {}
+        mock_httpx.post.return_value = mock_response
+
+        with patch.object(apns_utils.time, "sleep"):
+            success, reason = apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com"
+            )
+        assert success is False
+        assert reason == "HTTP 503"
+
+    def test_retries_transient_status(self, mock_secret_manager, mock_httpx):
+        _setup_real_key(mock_secret_manager)
+        throttled = MagicMock(status_code=429, content=b"", headers={
+            "retry-after": "0.5"})
+        ok = MagicMock(status_code=200)
+        mock_httpx.post.side_effect = [throttled, ok]
+
+        with patch.object(apns_utils.time, "sleep") as mock_sleep:
+            success, _ = apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com"
+            )
+
+        assert success is True
+        assert mock_httpx.post.call_count == 2
+        mock_sleep.assert_called_once_with(0.5)
+
+    def test_honours_apns_retry_after(self, mock_secret_manager, mock_httpx):
+        _setup_real_key(mock_secret_manager)
+        import httpx
+        throttled = httpx.Response(
+            429, headers={"apns-id": "x", "apns-retry-after": "1"},
+            content=b'{"reason": "TooManyRequests"}')
+        mock_httpx.post.side_effect = [throttled, httpx.Response(200)]
+
+        with patch.object(apns_utils.time, "sleep") as mock_sleep:
+            success, _ = apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com"
+            )
+
+        assert success is True
+        mock_sleep.assert_called_once_with(1.0)
+
+    def test_gives_up_after_max_attempts(
+        self, mock_secret_manager, mock_httpx
+    ):
+        _setup_real_key(mock_secret_manager)
+        mock_httpx.post.return_value = MagicMock(
+            status_code=500, content=b"", headers={})
+
+        with patch.object(apns_utils.time, "sleep") as mock_sleep:
+            success, reason = apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com"
+            )
+
+        assert (success, reason) == (False, "HTTP 500")
+        assert mock_httpx.post.call_count == apns_utils.APNS_MAX_ATTEMPTS
+        assert mock_sleep.call_count == apns_utils.APNS_MAX_ATTEMPTS - 1
+
+    def test_device_rejection_not_retried(
+        self, mock_secret_manager, mock_httpx
+    ):
+        _setup_real_key(mock_secret_manager)
+        mock_httpx.post.return_value = MagicMock(
+            status_code=410, content=b'{"reason": "Unregistered"}')
+
+        success, reason = apns_utils.send_apns_notification(
+            "a" * 64, "Title", "Body", "https://example.com"
+        )
+
+        assert (success, reason) == (False, "Unregistered")
+        mock_httpx.post.assert_called_once()
+
     def test_correct_headers_and_payload(
         self, mock_secret_manager, mock_httpx
     ):
@@ -192,7 +415,7 @@ class TestSendApnsNotification:
 
         call_args = mock_httpx.post.call_args
         headers = call_args[1]["headers"]
-        payload = call_args[1]["json"]
+        payload = json.loads(call_args[1]["content"])
 
         assert "authorization" in headers
         assert headers["authorization"].startswith("bearer ")
@@ -202,15 +425,60 @@ class TestSendApnsNotification:
         assert payload["aps"]["alert"]["body"] == "Test Body"
         assert payload["article_url"] == "https://example.com/article"
 
+    def test_reuses_http_client(self, mock_secret_manager):
+        _setup_real_key(mock_secret_manager)
+        with patch("httpx.Client") as mock_cls:
+            mock_cls.return_value.post.return_value.status_code = 200
+
+            pool_size = apns_utils.APNS_CONNECTIONS_PER_ENDPOINT
+            for i in range(pool_size + 1):
+                apns_utils.send_apns_notification(
+                    f"{i:x}" * 64, "Title", "Body", "https://example.com")
+
+            assert mock_cls.call_count == pool_size
+            assert mock_cls.call_args.kwargs["http2"] is True
+            assert mock_cls.call_args.kwargs["http1"] is False
+            assert mock_cls.return_value.post.call_count == pool_size + 1
+
+    def test_rotates_across_connections(self):
+        clients = [MagicMock() for _ in range(
+            apns_utils.APNS_CONNECTIONS_PER_ENDPOINT)]
+        with patch("httpx.Client", side_effect=clients):
+            picked = [
+                apns_utils.get_apns_client() for _ in range(len(clients) * 2)]
+
+        assert picked == clients * 2
+
+    def test_separate_client_per_endpoint(self, mock_secret_manager):
+        _setup_real_key(mock_secret_manager)
+        with patch("httpx.Client") as mock_cls:
+            mock_cls.return_value.post.return_value.status_code = 200
+
+            apns_utils.send_apns_notification(
+                "a" * 64, "Title", "Body", "https://example.com",
+                sandbox=False)
+            apns_utils.send_apns_notification(
+                "b" * 64, "Title", "Body", "https://example.com",
+                sandbox=True)
+
+            assert mock_cls.call_count == (
+                2 * apns_utils.APNS_CONNECTIONS_PER_ENDPOINT)
+
 
 class TestSendApnsNotifications:
     """Tests for send_apns_notifications()."""
 
     def setup_method(self):
         apns_utils.reset_apns_credentials()
+        apns_utils.reset_recent_fanouts()
+        self.jwt_patcher = patch.object(
+            apns_utils, "create_apns_jwt", return_value="test-jwt")
+        self.jwt_patcher.start()
 
     def teardown_method(self):
+        self.jwt_patcher.stop()
         apns_utils.reset_apns_credentials()
+        apns_utils.reset_recent_fanouts()
 
     def test_iterates_active_tokens(self, mock_firestore):
         doc1 = MagicMock()
@@ -222,11 +490,11 @@ class TestSendApnsNotifications:
 
         mock_query = MagicMock()
         mock_query.stream.return_value = [doc1, doc2]
-        mock_firestore.collection.return_value.where.return_value = (
-            mock_query)
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
 
         with patch.object(
-            apns_utils, "send_apns_notification"
+            apns_utils, "post_apns_notification"
         ) as mock_send:
             mock_send.return_value = (True, "")
             count = apns_utils.send_apns_notifications(
@@ -236,6 +504,8 @@ class TestSendApnsNotifications:
 
         assert count == 2
         assert mock_send.call_count == 2
+        mock_firestore.collection.return_value.where.return_value \
+            .select.assert_called_once_with(["token", "sandbox"])
 
     def test_marks_bad_tokens_inactive(self, mock_firestore):
         doc1 = MagicMock()
@@ -244,11 +514,11 @@ class TestSendApnsNotifications:
 
         mock_query = MagicMock()
         mock_query.stream.return_value = [doc1]
-        mock_firestore.collection.return_value.where.return_value = (
-            mock_query)
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
 
         with patch.object(
-            apns_utils, "send_apns_notification"
+            apns_utils, "post_apns_notification"
         ) as mock_send:
             mock_send.return_value = (False, "BadDeviceToken")
             count = apns_utils.send_apns_notifications(
@@ -257,7 +527,120 @@ class TestSendApnsNotifications:
             )
 
         assert count == 0
-        doc1.reference.update.assert_called_once_with({"active": False})
+        batch = mock_firestore.batch.return_value
+        batch.update.assert_called_once_with(
+            doc1.reference, {"active": False, "expire_at": ANY})
+        batch.commit.assert_called_once()
+        doc1.reference.update.assert_not_called()
+
+    def test_suppresses_duplicate_fanout(self, mock_firestore):
+        doc1 = MagicMock()
+        doc1.to_dict.return_value = {"token": "a" * 64}
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value.stream.return_value = [doc1]
+
+        with patch.object(
+            apns_utils, "post_apns_notification", return_value=(True, "")
+        ) as mock_send:
+            first = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com", db=mock_firestore)
+            second = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com", db=mock_firestore)
+            other = apns_utils.send_apns_notifications(
+                "Other", "Body", "https://example.com", db=mock_firestore)
+
+        assert (first, second, other) == (1, 0, 1)
+        assert mock_send.call_count == 2
+
+    def test_failed_fanout_can_be_retried(self, mock_firestore):
+        mock_firestore.collection.side_effect = [
+            Exception("Unavailable"), MagicMock()]
+
+        apns_utils.send_apns_notifications(
+            "Title", "Body", "https://example.com", db=mock_firestore)
+        apns_utils.send_apns_notifications(
+            "Title", "Body", "https://example.com", db=mock_firestore)
+
+        assert mock_firestore.collection.call_count == 2
+
+    def test_fanout_without_tokens_can_be_retried(self, mock_firestore):
+        doc1 = MagicMock()
+        doc1.to_dict.return_value = {"token": "a" * 64}
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value.stream.side_effect = [[], [doc1]]
+
+        with patch.object(
+            apns_utils, "post_apns_notification", return_value=(True, "")
+        ):
+            first = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com", db=mock_firestore)
+            second = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com", db=mock_firestore)
+
+        assert (first, second) == (0, 1)
+
+    @pytest.mark.parametrize("reason", [
+        "ExpiredProviderToken", "ConnectError('unreachable')"])
+    def test_undelivered_fanout_can_be_retried(self, mock_firestore, reason):
+        doc1 = MagicMock()
+        doc1.to_dict.return_value = {"token": "a" * 64}
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value.stream.return_value = [doc1]
+
+        with patch.object(
+            apns_utils, "post_apns_notification",
+            side_effect=[(False, reason), (True, "")]
+        ) as mock_send:
+            first = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com", db=mock_firestore)
+            second = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com", db=mock_firestore)
+
+        assert (first, second) == (0, 1)
+        assert mock_send.call_count == 2
+
+    def test_keeps_tokens_on_transient_errors(self, mock_firestore):
+        doc1 = MagicMock()
+        doc1.to_dict.return_value = {
+            "token": "a" * 64, "sandbox": False}
+
+        mock_query = MagicMock()
+        mock_query.stream.return_value = [doc1]
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
+
+        with patch.object(
+            apns_utils, "post_apns_notification",
+            return_value=(False, "PayloadTooLarge")
+        ):
+            apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com",
+                db=mock_firestore
+            )
+
+        mock_firestore.batch.assert_not_called()
+
+    def test_drops_jwt_rejected_as_expired(self, mock_firestore):
+        doc1 = MagicMock()
+        doc1.to_dict.return_value = {
+            "token": "a" * 64, "sandbox": False}
+
+        mock_query = MagicMock()
+        mock_query.stream.return_value = [doc1]
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
+
+        with patch.object(
+            apns_utils, "post_apns_notification",
+            return_value=(False, "ExpiredProviderToken")
+        ), patch.object(apns_utils, "reset_apns_jwt") as mock_reset:
+            apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com",
+                db=mock_firestore
+            )
+
+        mock_reset.assert_called_once()
+        mock_firestore.batch.assert_not_called()
 
     def test_returns_success_count(self, mock_firestore):
         doc1 = MagicMock()
@@ -269,11 +652,11 @@ class TestSendApnsNotifications:
 
         mock_query = MagicMock()
         mock_query.stream.return_value = [doc1, doc2]
-        mock_firestore.collection.return_value.where.return_value = (
-            mock_query)
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
 
         with patch.object(
-            apns_utils, "send_apns_notification"
+            apns_utils, "post_apns_notification"
         ) as mock_send:
             mock_send.side_effect = [
                 (True, ""), (False, "InternalError")]
@@ -284,14 +667,115 @@ class TestSendApnsNotifications:
 
         assert count == 1
 
+    def test_skips_docs_without_token(self, mock_firestore):
+        doc1 = MagicMock()
+        doc1.to_dict.return_value = {"sandbox": False}
+        doc2 = MagicMock()
+        doc2.to_dict.return_value = {
+            "token": "b" * 64, "sandbox": False}
+
+        mock_query = MagicMock()
+        mock_query.stream.return_value = [doc1, doc2]
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
+
+        with patch.object(
+            apns_utils, "post_apns_notification"
+        ) as mock_send:
+            mock_send.return_value = (True, "")
+            count = apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com",
+                db=mock_firestore
+            )
+
+        assert count == 1
+        mock_send.assert_called_once_with("b" * 64, ANY, ANY, False)
+
+    def test_builds_request_once_per_fan_out(self, mock_firestore):
+        docs = []
+        for token in ("a" * 64, "b" * 64, "c" * 64):
+            doc = MagicMock()
+            doc.to_dict.return_value = {"token": token, "sandbox": False}
+            docs.append(doc)
+
+        mock_query = MagicMock()
+        mock_query.stream.return_value = docs
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
+
+        with patch.object(
+            apns_utils, "post_apns_notification", return_value=(True, "")
+        ) as mock_send:
+            apns_utils.send_apns_notifications(
+                "Title", "Body", "https://example.com",
+                db=mock_firestore
+            )
+
+        apns_utils.create_apns_jwt.assert_called_once()
+        _, headers, content, _ = mock_send.call_args.args
+        for call in mock_send.call_args_list:
+            assert call.args[1] is headers
+            assert call.args[2] is content
+        assert headers["authorization"] == "bearer test-jwt"
+        assert json.loads(content)["article_url"] == "https://example.com"
+
+    def test_no_credentials_skips_query(self, mock_firestore):
+        apns_utils.create_apns_jwt.return_value = None
+
+        count = apns_utils.send_apns_notifications(
+            "Title", "Body", "https://example.com",
+            db=mock_firestore
+        )
+
+        assert count == 0
+        mock_firestore.collection.assert_not_called()
+
     def test_no_active_tokens(self, mock_firestore):
         mock_query = MagicMock()
         mock_query.stream.return_value = []
-        mock_firestore.collection.return_value.where.return_value = (
-            mock_query)
+        mock_firestore.collection.return_value.where.return_value \
+            .select.return_value = mock_query
 
         count = apns_utils.send_apns_notifications(
             "Title", "Body", "https://example.com",
             db=mock_firestore
         )
         assert count == 0
+
+
+class TestWarmUp:
+    """Tests for warm_up()."""
+
+    def setup_method(self):
+        apns_utils.reset_apns_credentials()
+        apns_utils.reset_apns_client()
+
+    def teardown_method(self):
+        apns_utils.reset_apns_credentials()
+        apns_utils.reset_apns_client()
+
+    def test_opens_production_connection(self, mock_secret_manager, mock_httpx):
+        _setup_real_key(mock_secret_manager)
+        with patch.object(apns_utils, "get_db") as mock_get_db:
+            apns_utils.warm_up()
+
+        mock_get_db.assert_called_once()
+        assert mock_httpx.head.call_count == (
+            apns_utils.APNS_CONNECTIONS_PER_ENDPOINT)
+        mock_httpx.head.assert_called_with("/")
+
+    def test_skips_connection_without_credentials(self, mock_httpx):
+        with patch(
+            "google.cloud.secretmanager.SecretManagerServiceClient"
+        ) as mock_cls, patch.object(apns_utils, "get_db"):
+            mock_cls.return_value.access_secret_version.side_effect = (
+                Exception("fail"))
+            apns_utils.warm_up()
+
+        mock_httpx.head.assert_not_called()
+
+    def test_swallows_errors(self):
+        with patch.object(
+            apns_utils, "get_db", side_effect=Exception("boom")
+        ):
+            apns_utils.warm_up()
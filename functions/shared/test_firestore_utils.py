@@ -1,4 +1,5 @@
 """Tests for shared Firestore utilities."""
+import pytest
 from unittest.mock import patch, MagicMock
 
 
@@ -56,3 +57,95 @@ class TestGetDb:
             assert mock_cls.call_count == 2
 
         firestore_utils.reset_db()
+
+
+class TestBatchUpdate:
+    """Tests for batch_update() function."""
+
+    def test_single_commit_for_small_batch(self):
+        from shared import firestore_utils
+        db = MagicMock()
+        refs = [MagicMock() for _ in range(3)]
+
+        firestore_utils.batch_update(db, refs, {"active": False})
+
+        db.batch.assert_called_once()
+        batch = db.batch.return_value
+        assert batch.update.call_count == 3
+        batch.update.assert_any_call(refs[0], {"active": False})
+        batch.commit.assert_called_once()
+
+    def test_chunks_at_batch_limit(self):
+        from shared import firestore_utils
+        db = MagicMock()
+        refs = [MagicMock()
+                for _ in range(firestore_utils.MAX_BATCH_WRITES + 1)]
+
+        firestore_utils.batch_update(db, refs, {"active": False})
+
+        assert db.batch.call_count == 2
+        assert db.batch.return_value.commit.call_count == 2
+
+    def test_failed_chunk_does_not_stop_later_chunks(self):
+        from shared import firestore_utils
+        db = MagicMock()
+        first, second = MagicMock(), MagicMock()
+        first.commit.side_effect = Exception("NotFound")
+        db.batch.side_effect = [first, second]
+        refs = [MagicMock()
+                for _ in range(firestore_utils.MAX_BATCH_WRITES + 1)]
+
+        with pytest.raises(Exception, match="NotFound"):
+            firestore_utils.batch_update(db, refs, {"active": False})
+
+        second.commit.assert_called_once()
+
+    def test_no_refs_no_commit(self):
+        from shared import firestore_utils
+        db = MagicMock()
+
+        firestore_utils.batch_update(db, [], {"active": False})
+
+        db.batch.assert_not_called()
+
+
+class TestActiveTokens:
+    """Tests for active_tokens() function."""
+
+    def test_filters_active_and_projects_fields(self):
+        from google.cloud.firestore import FieldFilter
+        from shared import firestore_utils
+        db = MagicMock()
+
+        query = firestore_utils.active_tokens(db, "fcm_tokens", ["token"])
+
+        db.collection.assert_called_once_with("fcm_tokens")
+        where = db.collection.return_value.where
+        (field_filter,) = where.call_args.kwargs.values()
+        assert isinstance(field_filter, FieldFilter)
+        assert (field_filter.field_path, field_filter.op_string,
+                field_filter.value) == ("active", "==", True)
+        where.return_value.select.assert_called_once_with(["token"])
+        assert query is where.return_value.select.return_value
+
+
+class TestInactiveTokenExpiry:
+    """Tests for inactive_token_expiry() function."""
+
+    def test_adds_ttl_to_given_time(self):
+        from datetime import datetime, timezone
+        from shared import firestore_utils
+        now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        expiry = firestore_utils.inactive_token_expiry(now)
+
+        assert expiry == now + firestore_utils.INACTIVE_TOKEN_TTL
+
+    def test_defaults_to_current_time(self):
+        from datetime import datetime, timezone
+        from shared import firestore_utils
+        before = datetime.now(timezone.utc)
+
+        expiry = firestore_utils.inactive_token_expiry()
+
+        assert expiry >= before + firestore_utils.INACTIVE_TOKEN_TTL
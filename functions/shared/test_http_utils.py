@@ -4,6 +4,7 @@ import flask
 from shared.http_utils import (
     cors_headers,
     handle_cors_preflight,
+    get_json_body,
     json_response,
     error_response,
     CORS_HEADERS,
@@ -23,6 +24,13 @@ class TestCorsHeaders:
         headers = cors_headers()
         assert headers["Access-Control-Allow-Origin"] == "*"
 
+    def test_shared_headers_survive_flask_response(self):
+        app = _get_app()
+        with app.test_request_context():
+            response = app.make_response(error_response("bad"))
+            response.headers["X-Extra"] = "1"
+        assert cors_headers() == {"Access-Control-Allow-Origin": "*"}
+
 
 class TestHandleCorsPreflight:
     """Tests for handle_cors_preflight()."""
@@ -98,3 +106,47 @@ class TestErrorResponse:
         with app.test_request_context():
             _, _, headers = error_response("error")
             assert headers["Access-Control-Allow-Origin"] == "*"
+
+    def test_json_content_type(self):
+        response, _, _ = error_response("Invalid input")
+        assert response.mimetype == "application/json"
+
+    def test_works_outside_app_context(self):
+        response, _, _ = error_response("Method not allowed", 405)
+        data = json.loads(response.get_data(as_text=True))
+        assert data["error"] == "Method not allowed"
+
+
+class TestGetJsonBody:
+    """Tests for get_json_body()."""
+
+    def test_parses_json_body(self):
+        app = _get_app()
+        with app.test_request_context(
+            method="POST", content_type="application/json",
+            data=json.dumps({"token": "abc"}),
+        ):
+            assert get_json_body(flask.request) == {"token": "abc"}
+
+    def test_malformed_body_returns_none(self):
+        app = _get_app()
+        with app.test_request_context(
+            method="POST", content_type="application/json",
+            data="not json",
+        ):
+            assert get_json_body(flask.request) is None
+
+    def test_empty_body_returns_none(self):
+        app = _get_app()
+        with app.test_request_context(
+            method="POST", content_type="application/json",
+        ):
+            assert get_json_body(flask.request) is None
+
+    def test_non_json_content_type_returns_none(self):
+        app = _get_app()
+        with app.test_request_context(
+            method="POST", content_type="text/plain",
+            data=json.dumps({"token": "abc"}),
+        ):
+            assert get_json_body(flask.request) is None
@@ -3,6 +3,7 @@ import json
 import logging
 from unittest.mock import patch
 from io import StringIO
+from pathlib import PurePosixPath
 from shared.logging_config import CloudFunctionLogger, JSONFormatter
 
 
@@ -45,6 +46,15 @@ class TestJSONFormatter:
         assert parsed["user_id"] == 123
         assert parsed["platform"] == "ios"
 
+    def test_non_json_values_stringified(self):
+        formatter = JSONFormatter("test")
+        record = logging.LogRecord(
+            "test", logging.INFO, "", 0, "msg", (), None)
+        record.extra = {"path": PurePosixPath("/a/b")}
+        output = formatter.format(record)
+        parsed = json.loads(output)
+        assert parsed["path"] == "/a/b"
+
     def test_exception_info_included(self):
         formatter = JSONFormatter("test")
         try:
@@ -105,3 +115,37 @@ class TestCloudFunctionLogger:
         output = stream.getvalue()
         parsed = json.loads(output.strip())
         assert parsed["component"] == "my-function"
+
+    def test_exception_logging(self):
+        cloud_logger, stream = self._make_logger_with_capture("test-fn")
+        try:
+            raise ValueError("boom")
+        except ValueError as e:
+            cloud_logger.exception("Failed", error=str(e))
+        output = stream.getvalue()
+        parsed = json.loads(output.strip())
+        assert parsed["severity"] == "ERROR"
+        assert parsed["error"] == "boom"
+        assert "Traceback" in parsed["exception"]
+        assert "ValueError: boom" in parsed["exception"]
+
+    def test_one_line_per_entry(self):
+        cloud_logger, stream = self._make_logger_with_capture("test-fn")
+        cloud_logger.info("first")
+        cloud_logger.warning("second")
+        lines = stream.getvalue().splitlines()
+        assert [json.loads(line)["message"] for line in lines] == [
+            "first", "second"]
+
+    def test_write_failure_does_not_raise(self, capsys):
+        cloud_logger, stream = self._make_logger_with_capture("test-fn")
+        stream.close()
+        cloud_logger.info("dropped")
+        assert "Logging error" in capsys.readouterr().err
+
+    def test_orjson_rejection_falls_back_to_json(self):
+        cloud_logger, stream = self._make_logger_with_capture("test-fn")
+        cloud_logger.info("big", count=2 ** 70)
+        parsed = json.loads(stream.getvalue())
+        assert parsed["count"] == 2 ** 70
+        assert parsed["message"] == "big"
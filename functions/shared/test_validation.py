@@ -37,6 +37,18 @@ class TestApnsTokenValidation:
     def test_non_string(self):
         assert TokenValidator.is_valid_apns_token(12345) is False
 
+    def test_trailing_newline_rejected(self):
+        token = "a" * 63 + "\n"
+        assert TokenValidator.is_valid_apns_token(token) is False
+
+    def test_embedded_whitespace_rejected(self):
+        token = "a" * 62 + "  "
+        assert TokenValidator.is_valid_apns_token(token) is False
+
+    def test_non_ascii_rejected(self):
+        token = "a" * 63 + "\u00e9"
+        assert TokenValidator.is_valid_apns_token(token) is False
+
 
 class TestFcmTokenValidation:
     """Tests for is_valid_fcm_token()."""
@@ -69,6 +81,14 @@ class TestFcmTokenValidation:
         token = "a" * 149 + "!"
         assert TokenValidator.is_valid_fcm_token(token) is False
 
+    def test_trailing_newline_rejected(self):
+        token = "a" * 149 + "\n"
+        assert TokenValidator.is_valid_fcm_token(token) is False
+
+    def test_non_ascii_rejected(self):
+        token = "a" * 149 + "é"
+        assert TokenValidator.is_valid_fcm_token(token) is False
+
     def test_empty_string(self):
         assert TokenValidator.is_valid_fcm_token("") is False
 
@@ -96,3 +116,6 @@ class TestPlatformValidation:
 
     def test_uppercase(self):
         assert TokenValidator.is_valid_platform("iOS") is False
+
+    def test_non_string(self):
+        assert TokenValidator.is_valid_platform(["ios"]) is False
@@ -71,19 +71,16 @@ opml_data = """<?xml version="1.0" encoding="UTF-8"?>
 </opml>
 """
 
-candidates = []
-for line in opml_data.splitlines():
-    if 'xmlUrl=' in line:
-        # Simple regex to extract title and xmlUrl
-        title_match = re.search(r'title="([^"]+)"', line)
-        url_match = re.search(r'xmlUrl="([^"]+)"', line)
-        
-        if title_match and url_match:
-            candidates.append({
-                "name": title_match.group(1),
-                "type": "rss",
-                "url": url_match.group(1)
-            })
+# The export isn't well-formed XML (bare "&" in titles and URLs), so feed
+# outlines are pulled out with one regex pass over the whole document
+# rather than an XML parser.
+FEED_OUTLINE = re.compile(
+    r'<outline\b[^>]*?\btitle="([^"]+)"[^>]*?\bxmlUrl="([^"]+)"')
+
+candidates = [
+    {"name": title, "type": "rss", "url": url}
+    for title, url in FEED_OUTLINE.findall(opml_data)
+]
 
 with open("candidates.json", "w") as f:
     json.dump(candidates, f, indent=2)
@@ -13,7 +13,9 @@ import sys
 import ssl
 import json
 import argparse
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Import from our other script
@@ -90,12 +92,13 @@ def get_output_dirname(subdomain: str) -> str:
     return subdomain
 
 
-def load_tokens() -> dict:
-    """Load tokens from config file."""
+@lru_cache(maxsize=1)
+def load_tokens() -> MappingProxyType:
+    """Load tokens from config file (read once, returned read-only)."""
     token_file = Path.home() / '.substack_tokens.json'
     if token_file.exists():
-        return json.loads(token_file.read_text())
-    return {}
+        return MappingProxyType(json.loads(token_file.read_text()))
+    return MappingProxyType({})
 
 
 def save_tokens(tokens: dict):
@@ -103,6 +106,7 @@ def save_tokens(tokens: dict):
     token_file = Path.home() / '.substack_tokens.json'
     token_file.write_text(json.dumps(tokens, indent=2))
     token_file.chmod(0o600)
+    load_tokens.cache_clear()
 
 
 def fetch_substack(name: str, subdomain: str, token: str = None, output_base: Path = None) -> dict:
@@ -131,12 +135,15 @@ def fetch_substack(name: str, subdomain: str, token: str = None, output_base: Pa
                     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
                 })
                 with urlopen(req, timeout=30, context=SSL_CONTEXT) as response:
-                    xml_content = response.read().decode('utf-8')
+                    raw = response.read()
 
-                # Check if we got HTML instead of RSS (paid newsletter)
-                if '<!DOCTYPE html>' in xml_content[:500] or '<html' in xml_content[:500]:
+                # Check if we got HTML instead of RSS (paid newsletter);
+                # parse_rss takes the raw bytes, so nothing is decoded here
+                head = raw[:500]
+                if b'<!DOCTYPE html>' in head or b'<html' in head:
                     result["error"] = "Paid newsletter - requires subscriber token"
                     return result
+                xml_content = raw
             except Exception as e:
                 result["error"] = f"Could not fetch RSS: {e}"
                 return result
@@ -166,7 +173,9 @@ def main():
     parser.add_argument('-o', '--output', default='./substack_articles', help='Output directory')
     parser.add_argument('--free-only', action='store_true', help='Only fetch free content (no tokens)')
     parser.add_argument('--list', action='store_true', help='List configured Substacks')
-    parser.add_argument('--parallel', type=int, default=4, help='Number of parallel fetches')
+    # Fetches are network-bound and urlopen releases the GIL while waiting,
+    # so threads overlap them well beyond the CPU count
+    parser.add_argument('--parallel', type=int, default=16, help='Number of parallel fetches')
     parser.add_argument('--subdomain', help='Fetch only this subdomain')
     args = parser.parse_args()
 
@@ -15,10 +15,12 @@ import os
 import re
 import sys
 import html
+import json
 import ssl
 import argparse
 from pathlib import Path
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 from urllib.request import urlopen, Request
 from xml.etree import ElementTree as ET
 
@@ -28,64 +30,86 @@ SSL_CONTEXT.check_hostname = False
 SSL_CONTEXT.verify_mode = ssl.CERT_NONE
 
 
-def html_to_markdown(html_content: str) -> str:
-    """Convert HTML to markdown (simple implementation)."""
-    if not html_content:
-        return ""
+_DOTALL_I = re.DOTALL | re.IGNORECASE
 
-    text = html_content
 
-    # Decode HTML entities
-    text = html.unescape(text)
+def _heading(level: int):
+    """Replacement turning an <hN> match into a markdown heading."""
+    prefix = '#' * level
+    return lambda m: f"{prefix} {m.group(1)}\n\n"
+
 
+def _blockquote(m) -> str:
+    """Replacement prefixing every line of a <blockquote> match with '> '."""
+    return '> ' + m.group(1).strip().replace('\n', '\n> ') + '\n\n'
+
+
+# (pattern, replacement) pairs applied in order by html_to_markdown,
+# compiled once rather than looked up in re's cache on every article
+_HTML_TO_MARKDOWN_SUBS = tuple((re.compile(pattern, flags), repl) for pattern, repl, flags in (
     # Headers
-    for i in range(6, 0, -1):
-        text = re.sub(f'<h{i}[^>]*>(.*?)</h{i}>', lambda m: f"{'#' * i} {m.group(1)}\n\n", text, flags=re.DOTALL | re.IGNORECASE)
+    *((f'<h{i}[^>]*>(.*?)</h{i}>', _heading(i), _DOTALL_I) for i in range(6, 0, -1)),
 
     # Bold and italic
-    text = re.sub(r'<strong[^>]*>(.*?)</strong>', r'**\1**', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<b[^>]*>(.*?)</b>', r'**\1**', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<em[^>]*>(.*?)</em>', r'*\1*', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<i[^>]*>(.*?)</i>', r'*\1*', text, flags=re.DOTALL | re.IGNORECASE)
+    (r'<strong[^>]*>(.*?)</strong>', r'**\1**', _DOTALL_I),
+    (r'<b[^>]*>(.*?)</b>', r'**\1**', _DOTALL_I),
+    (r'<em[^>]*>(.*?)</em>', r'*\1*', _DOTALL_I),
+    (r'<i[^>]*>(.*?)</i>', r'*\1*', _DOTALL_I),
 
     # Links
-    text = re.sub(r'<a[^>]*href=["\']([^"\']*)["\'][^>]*>(.*?)</a>', r'[\2](\1)', text, flags=re.DOTALL | re.IGNORECASE)
+    (r'<a[^>]*href=["\']([^"\']*)["\'][^>]*>(.*?)</a>', r'[\2](\1)', _DOTALL_I),
 
     # Images
-    text = re.sub(r'<img[^>]*src=["\']([^"\']*)["\'][^>]*alt=["\']([^"\']*)["\'][^>]*/?\s*>', r'![\2](\1)', text, flags=re.IGNORECASE)
-    text = re.sub(r'<img[^>]*src=["\']([^"\']*)["\'][^>]*/?\s*>', r'![](\1)', text, flags=re.IGNORECASE)
+    (r'<img[^>]*src=["\']([^"\']*)["\'][^>]*alt=["\']([^"\']*)["\'][^>]*/?\s*>', r'![\2](\1)', re.IGNORECASE),
+    (r'<img[^>]*alt=["\']([^"\']*)["\'][^>]*src=["\']([^"\']*)["\'][^>]*/?\s*>', r'![\1](\2)', re.IGNORECASE),
+    (r'<img[^>]*src=["\']([^"\']*)["\'][^>]*/?\s*>', r'![](\1)', re.IGNORECASE),
 
     # Code blocks
-    text = re.sub(r'<pre[^>]*><code[^>]*>(.*?)</code></pre>', r'```\n\1\n```', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<code[^>]*>(.*?)</code>', r'`\1`', text, flags=re.DOTALL | re.IGNORECASE)
+    (r'<pre[^>]*><code[^>]*>(.*?)</code></pre>', r'```\n\1\n```', _DOTALL_I),
+    (r'<code[^>]*>(.*?)</code>', r'`\1`', _DOTALL_I),
 
     # Blockquotes
-    text = re.sub(r'<blockquote[^>]*>(.*?)</blockquote>', lambda m: '> ' + m.group(1).strip().replace('\n', '\n> ') + '\n\n', text, flags=re.DOTALL | re.IGNORECASE)
+    (r'<blockquote[^>]*>(.*?)</blockquote>', _blockquote, _DOTALL_I),
 
     # Lists
-    text = re.sub(r'<li[^>]*>(.*?)</li>', r'- \1\n', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'</?[ou]l[^>]*>', '\n', text, flags=re.IGNORECASE)
+    (r'<li[^>]*>(.*?)</li>', r'- \1\n', _DOTALL_I),
+    (r'</?[ou]l[^>]*>', '\n', re.IGNORECASE),
 
     # Paragraphs and breaks
-    text = re.sub(r'<p[^>]*>(.*?)</p>', r'\1\n\n', text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
-    text = re.sub(r'<hr\s*/?>', '\n---\n', text, flags=re.IGNORECASE)
+    (r'<p[^>]*>(.*?)</p>', r'\1\n\n', _DOTALL_I),
+    (r'<br\s*/?>', '\n', re.IGNORECASE),
+    (r'<hr\s*/?>', '\n---\n', re.IGNORECASE),
 
     # Remove remaining HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
+    (r'<[^>]+>', '', 0),
 
     # Clean up whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = re.sub(r' +', ' ', text)
+    (r'\n{3,}', '\n\n', 0),
+    (r' {2,}', ' ', 0),
+))
+
+
+def html_to_markdown(html_content: str) -> str:
+    """Convert HTML to markdown (simple implementation)."""
+    if not html_content:
+        return ""
+
+    # Decode HTML entities
+    text = html.unescape(html_content)
+
+    for pattern, repl in _HTML_TO_MARKDOWN_SUBS:
+        text = pattern.sub(repl, text)
 
     return text.strip()
 
 
+_UNSAFE_FILENAME_CHARS = str.maketrans('', '', '<>:"/\\|?*')
+
+
 def sanitize_filename(title: str) -> str:
     """Convert title to safe filename."""
-    # Remove/replace unsafe characters
-    safe = re.sub(r'[<>:"/\\|?*]', '', title)
-    safe = re.sub(r'\s+', '-', safe)
+    # Remove unsafe characters, then join whitespace runs with hyphens
+    safe = '-'.join(title.translate(_UNSAFE_FILENAME_CHARS).split())
     safe = safe.strip('-')
     return safe[:100]  # Limit length
 
@@ -105,8 +129,8 @@ def get_token() -> str:
     return None
 
 
-def fetch_rss(substack_url: str, token: str) -> str:
-    """Fetch RSS feed with authentication."""
+def fetch_rss(substack_url: str, token: str) -> bytes:
+    """Fetch RSS feed with authentication, as raw bytes for parse_rss."""
     # Normalize URL
     base_url = substack_url.rstrip('/')
     feed_url = f"{base_url}/feed?token={token}"
@@ -116,35 +140,50 @@ def fetch_rss(substack_url: str, token: str) -> str:
     })
 
     with urlopen(req, timeout=30, context=SSL_CONTEXT) as response:
-        return response.read().decode('utf-8')
+        return response.read()
+
+
+def _rss_element_re(tag: bytes) -> re.Pattern:
+    """Compile a pattern capturing an RSS element's text, CDATA or not."""
+    return re.compile(rb'<%s[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</%s>' % (tag, tag), _DOTALL_I)
+
+
+# Patterns used by parse_rss_regex_fallback. They match raw feed bytes, so
+# only the extracted fields are ever decoded.
+_RSS_ITEM_RE = re.compile(rb'<item[^>]*>(.*?)</item>', _DOTALL_I)
+_RSS_TITLE_RE = _rss_element_re(b'title')
+_RSS_LINK_RE = _rss_element_re(b'link')
+_RSS_PUBDATE_RE = _rss_element_re(b'pubDate')
+_RSS_CONTENT_RE = _rss_element_re(b'content:encoded')
+_RSS_DESC_RE = _rss_element_re(b'description')
+
 
+def _match_text(match: re.Match | None) -> str:
+    """Decode a fallback pattern's captured bytes, or '' if it didn't match."""
+    return match.group(1).decode('utf-8', errors='replace') if match else ''
 
-def parse_rss_regex_fallback(xml_content: str) -> list[dict]:
+
+def parse_rss_regex_fallback(xml_content: bytes) -> list[dict]:
     """Fallback RSS parser using regex for malformed XML."""
     articles = []
-    from email.utils import parsedate_to_datetime
+
+    if isinstance(xml_content, str):
+        xml_content = xml_content.encode('utf-8')
 
     # Find all items using regex
-    item_pattern = re.compile(r'<item[^>]*>(.*?)</item>', re.DOTALL | re.IGNORECASE)
-    title_pattern = re.compile(r'<title[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</title>', re.DOTALL | re.IGNORECASE)
-    link_pattern = re.compile(r'<link[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</link>', re.DOTALL | re.IGNORECASE)
-    pubdate_pattern = re.compile(r'<pubDate[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</pubDate>', re.DOTALL | re.IGNORECASE)
-    content_pattern = re.compile(r'<content:encoded[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</content:encoded>', re.DOTALL | re.IGNORECASE)
-    desc_pattern = re.compile(r'<description[^>]*>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</description>', re.DOTALL | re.IGNORECASE)
-
-    for item_match in item_pattern.finditer(xml_content):
+    for item_match in _RSS_ITEM_RE.finditer(xml_content):
         item_text = item_match.group(1)
 
-        title_match = title_pattern.search(item_text)
-        link_match = link_pattern.search(item_text)
-        pubdate_match = pubdate_pattern.search(item_text)
-        content_match = content_pattern.search(item_text)
-        desc_match = desc_pattern.search(item_text)
+        title_match = _RSS_TITLE_RE.search(item_text)
+        link_match = _RSS_LINK_RE.search(item_text)
+        pubdate_match = _RSS_PUBDATE_RE.search(item_text)
+        content_match = _RSS_CONTENT_RE.search(item_text)
+        desc_match = _RSS_DESC_RE.search(item_text)
 
-        title = html.unescape(title_match.group(1).strip()) if title_match else ''
-        link = link_match.group(1).strip() if link_match else ''
-        pub_date = pubdate_match.group(1).strip() if pubdate_match else ''
-        content = content_match.group(1) if content_match else (desc_match.group(1) if desc_match else '')
+        title = html.unescape(_match_text(title_match).strip())
+        link = _match_text(link_match).strip()
+        pub_date = _match_text(pubdate_match).strip()
+        content = _match_text(content_match or desc_match)
 
         # Parse date
         date_str = ''
@@ -166,52 +205,65 @@ def parse_rss_regex_fallback(xml_content: str) -> list[dict]:
     return articles
 
 
-def parse_rss(xml_content: str) -> list[dict]:
-    """Parse RSS XML and extract articles."""
+# Feed text is handed to the XML parser in chunks of this many characters
+RSS_PARSE_CHUNK = 64 * 1024
+
+
+def parse_rss_item(item: ET.Element) -> dict:
+    """Extract an article dict from a parsed <item> element."""
+    title = item.findtext('title', '')
+    link = item.findtext('link', '')
+    pub_date = item.findtext('pubDate', '')
+
+    # Try content:encoded first (full content), fallback to description
+    content = item.findtext('{http://purl.org/rss/1.0/modules/content/}encoded', '')
+    if not content:
+        content = item.findtext('description', '')
+
+    # Parse date
+    date_str = ''
+    if pub_date:
+        try:
+            # Parse RFC 2822 date format
+            dt = parsedate_to_datetime(pub_date)
+            date_str = dt.strftime('%Y-%m-%d')
+        except:
+            date_str = pub_date[:10] if len(pub_date) >= 10 else ''
+
+    return {
+        'title': title,
+        'link': link,
+        'date': date_str,
+        'content_html': content,
+    }
+
+
+def parse_rss(xml_content: bytes) -> list[dict]:
+    """Parse RSS XML and extract articles.
+
+    The feed is parsed incrementally and each <item> is cleared once read,
+    so the full element tree of a multi-megabyte feed is never held at once.
+    Raw bytes go straight to the XML parser, which decodes them per the
+    feed's declared encoding, and to the regex fallback, which only decodes
+    the fields it extracts. A str is accepted too.
+    """
+    articles = []
+    parser = ET.XMLPullParser(events=('end',))
+
     # Try standard XML parsing first
     try:
-        root = ET.fromstring(xml_content)
+        for start in range(0, len(xml_content), RSS_PARSE_CHUNK):
+            parser.feed(xml_content[start:start + RSS_PARSE_CHUNK])
+            for _, elem in parser.read_events():
+                if elem.tag == 'item':
+                    articles.append(parse_rss_item(elem))
+                    elem.clear()
+        parser.close()
     except ET.ParseError as e:
         # Fall back to regex parser for malformed XML
         print(f"  XML parse error, using regex fallback: {e}")
         return parse_rss_regex_fallback(xml_content)
 
-    articles = []
-
-    # Handle namespaces
-    namespaces = {
-        'content': 'http://purl.org/rss/1.0/modules/content/',
-        'dc': 'http://purl.org/dc/elements/1.1/',
-    }
-
-    for item in root.findall('.//item'):
-        title = item.findtext('title', '')
-        link = item.findtext('link', '')
-        pub_date = item.findtext('pubDate', '')
-
-        # Try content:encoded first (full content), fallback to description
-        content = item.findtext('{http://purl.org/rss/1.0/modules/content/}encoded', '')
-        if not content:
-            content = item.findtext('description', '')
-
-        # Parse date
-        date_str = ''
-        if pub_date:
-            try:
-                # Parse RFC 2822 date format
-                from email.utils import parsedate_to_datetime
-                dt = parsedate_to_datetime(pub_date)
-                date_str = dt.strftime('%Y-%m-%d')
-            except:
-                date_str = pub_date[:10] if len(pub_date) >= 10 else ''
-
-        articles.append({
-            'title': title,
-            'link': link,
-            'date': date_str,
-            'content_html': content,
-        })
-
     return articles
 
 
@@ -230,9 +282,11 @@ def save_articles(articles: list[dict], output_dir: Path) -> int:
         filename = f"{date}-{sanitize_filename(title)}.md" if date else f"{sanitize_filename(title)}.md"
         filepath = output_dir / filename
 
-        # Build markdown document
+        # Build markdown document. A JSON string is a valid YAML
+        # double-quoted scalar, so quotes, backslashes and newlines in the
+        # title are escaped correctly.
         frontmatter = f"""---
-title: "{title.replace('"', '\\"')}"
+title: {json.dumps(title, ensure_ascii=False)}
 date: {date}
 source: {link}
 ---